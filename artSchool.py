@@ -1,41 +1,569 @@
-import tkinter as tk
-from tkinter import messagebox
-from threading import Thread
-from time import sleep
+from threading import Thread, Event, get_ident
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 import random
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
+import heapq
+import bisect
+import math
+from array import array
 import time
+import argparse
+import json
+import sys
+import os
+import csv
+import hashlib
+import itertools
+import struct
+import pickle
+import zlib
+import mmap
+from datetime import datetime
+from collections import deque, namedtuple
+from queue import SimpleQueue, Empty
+from types import MappingProxyType
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# tkinter и matplotlib загружаются только при запуске графического интерфейса
+tk = None
+messagebox = None
+plt = None
+FigureCanvasTkAgg = None
+
+def load_gui_modules():
+    global tk, messagebox
+    if tk is None:
+        import tkinter
+        from tkinter import messagebox as tk_messagebox
+        tk = tkinter
+        messagebox = tk_messagebox
+
+def load_chart_modules():
+    global plt, FigureCanvasTkAgg
+    if plt is None:
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg as canvas_class
+        import matplotlib.pyplot as pyplot
+        plt = pyplot
+        FigureCanvasTkAgg = canvas_class
+
+class SimulationClock:
+    def __init__(self):
+        self.current_time = 0.0
+
+    def now(self):
+        return self.current_time
+
+    def advance(self, timestamp):
+        self.current_time = timestamp
+
+    def reset(self):
+        self.current_time = 0.0
+
+class EventCalendar:
+    ARRIVAL = "arrival"
+    SERVICE_COMPLETION = "service_completion"
+    TEACHER_REMOVAL = "teacher_removal"
+    QUEUE_DRAIN = "queue_drain"
+    METRICS_EXPORT = "metrics_export"
+
+    def __init__(self, clock, commands):
+        self.clock = clock
+        self.commands = commands
+        self.events = []
+        self.sequence = 0
+        self.stopped = False
+        self.profiler = None
+
+    def schedule(self, delay, event_type, handler, *args):
+        # Порядковый номер сохраняет порядок событий с одинаковым временем
+        self.sequence += 1
+        heapq.heappush(self.events, (self.clock.now() + delay, self.sequence, event_type, handler, args))
+
+    def schedule_at(self, event_time, event_type, handler, *args):
+        # Абсолютное время нужно при воспроизведении трассы: now + (t - now) не всегда равно t
+        self.sequence += 1
+        heapq.heappush(self.events, (event_time, self.sequence, event_type, handler, args))
+
+    def stop(self):
+        self.stopped = True
+
+    def reset(self):
+        self.events = []
+        self.sequence = 0
+        self.stopped = False
+        self.clock.reset()
+
+    def run(self, until=None, time_scale=None, is_paused=None):
+        # Без time_scale модель работает так быстро, как позволяет процессор;
+        # с time_scale одна секунда модели длится 1 / time_scale секунд реального времени
+        self.stopped = False
+        processed_events = 0
+        wall_start = time.monotonic()
+        model_start = self.clock.now()
+
+        while self.events and not self.stopped:
+            if not self.commands.pending.empty():
+                self.commands.apply_pending()
+
+            event_time, _, event_type, handler, args = self.events[0]
+            if until is not None and event_time > until:
+                break
+
+            if time_scale:
+                if is_paused and is_paused():
+                    while is_paused() and not self.stopped:
+                        self.commands.wait(0.1)
+                    wall_start = time.monotonic()
+                    model_start = self.clock.now()
+                    continue
+
+                delay = (event_time - model_start) / time_scale - (time.monotonic() - wall_start)
+                if delay > 0:
+                    self.commands.wait(min(delay, 0.1))
+                    continue
+
+            heapq.heappop(self.events)
+            self.clock.advance(event_time)
+            if self.profiler is None:
+                handler(*args)
+            else:
+                started = time.perf_counter()
+                handler(*args)
+                self.profiler.record(event_type, time.perf_counter() - started)
+            processed_events += 1
+
+        if until is not None and not self.stopped:
+            self.clock.advance(max(self.clock.now(), until))
+
+        return processed_events
+
+class CommandQueue:
+    # Все изменения состояния из других потоков (интерфейс, внешние источники заявок)
+    # передаются владельцу модели и применяются им пачками между событиями календаря
+    BATCH_SIZE = 1000
+
+    def __init__(self):
+        self.pending = SimpleQueue()
+        self.owner = None
+
+    # Очередь команд и владелец относятся к живому процессу и в контрольную точку не попадают
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def submit(self, handler, *args):
+        future = Future()
+        if self.owner is None or self.owner == get_ident():
+            self.execute(handler, args, future)
+        else:
+            self.pending.put((handler, args, future))
+        return future
+
+    def call(self, handler, *args):
+        return self.submit(handler, *args).result()
+
+    @staticmethod
+    def execute(handler, args, future):
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(handler(*args))
+            except Exception as error:
+                future.set_exception(error)
+
+    def apply_pending(self, limit=None):
+        limit = limit or self.BATCH_SIZE
+        applied = 0
+        while applied < limit:
+            try:
+                handler, args, future = self.pending.get_nowait()
+            except Empty:
+                break
+            self.execute(handler, args, future)
+            applied += 1
+        return applied
+
+    def wait(self, timeout):
+        # Ожидание владельца (пауза, темп реального времени) тоже обслуживает команды
+        try:
+            handler, args, future = self.pending.get(timeout=timeout)
+        except Empty:
+            return 0
+        self.execute(handler, args, future)
+        return 1 + self.apply_pending()
+
+    def take_ownership(self):
+        self.owner = get_ident()
+
+    def serve_forever(self):
+        self.take_ownership()
+        while True:
+            self.wait(0.5)
+
+class StateSnapshots:
+    # Неизменяемые снимки состояния для читателей из других потоков. Снимок строит
+    # владелец модели по команде, поэтому он согласован между событиями
+    METRICS = {
+        "time": lambda school: school.simulation.clock.now(),
+        "courses": lambda school: tuple(
+            (course.title, course.capacity, tuple(student.name for student in course.enrolled_students))
+            for course in school.courses
+        ),
+        "queue_length": lambda school: len(school.simulation.queue.applications),
+        "queue": lambda school: tuple(
+            (application.student.name, application.course.title)
+            for application in school.simulation.queue.applications
+        ),
+        "refusals": lambda school: school.simulation.queue.get_refusals(),
+        "teacher_utilization": lambda school: tuple(
+            (teacher.name, is_busy, utilization)
+            for teacher, (is_busy, utilization) in school.get_teacher_utilization().items()
+        ),
+        "system_utilization": lambda school: school.get_system_utilization(),
+        "log_sequence": lambda school: school.simulation.logger.sequence,
+    }
+
+    def __init__(self):
+        self.latest = MappingProxyType({})
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def take(self, school, metrics):
+        return MappingProxyType({metric: self.METRICS[metric](school) for metric in metrics})
+
+    def publish(self, school, metrics):
+        self.latest = self.take(school, metrics)
+        return self.latest
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    # Гистограмма с фиксированными границами корзин (верхняя граница включительно, как в Prometheus)
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class NullInstrument:
+    # Отключённые метрики получают этот объект: все обновления ничего не делают
+    __slots__ = ()
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+NULL_INSTRUMENT = NullInstrument()
+
+class Metrics:
+    # Счётчики, измерители и гистограммы модели. Измерители-функции вычисляются только при
+    # снятии снимка, поэтому не стоят ничего на горячем пути
+    TIME_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+    LENGTH_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 1000, 10000, 100000)
+    EVENT_SECONDS_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 0.1)
+    FORMATS = ("prometheus", "json")
+
+    def __init__(self, enabled=False, export_path=None, export_format="prometheus", export_interval=0,
+                 profile_events=False):
+        self.enabled = enabled or bool(export_path) or profile_events
+        self.export_path = export_path
+        self.export_format = export_format
+        self.export_interval = export_interval
+        self.profile_events = profile_events
+        self.instruments = {}
+        self.descriptions = {}
+
+    def register(self, kind, name, description, factory, labels):
+        if not self.enabled:
+            return NULL_INSTRUMENT
+        key = (name, tuple(sorted(labels.items())))
+        if key not in self.instruments:
+            self.instruments[key] = factory()
+            self.descriptions[name] = (kind, description)
+        return self.instruments[key]
+
+    def counter(self, name, description, **labels):
+        return self.register("counter", name, description, Counter, labels)
+
+    def gauge(self, name, description, **labels):
+        return self.register("gauge", name, description, Gauge, labels)
+
+    def gauge_function(self, name, description, function, **labels):
+        return self.register("gauge", name, description, lambda: function, labels)
+
+    def histogram(self, name, description, buckets=TIME_BUCKETS, **labels):
+        return self.register("histogram", name, description, lambda: Histogram(buckets), labels)
+
+    @staticmethod
+    def value(instrument):
+        if isinstance(instrument, Histogram):
+            cumulative = list(itertools.accumulate(instrument.counts))
+            return {
+                "buckets": dict(zip([str(bucket) for bucket in instrument.buckets] + ["+Inf"], cumulative)),
+                "sum": instrument.sum,
+                "count": instrument.count,
+            }
+        if callable(instrument):
+            return instrument()
+        return instrument.value
+
+    def snapshot(self):
+        snapshot = {}
+        for (name, labels), instrument in self.instruments.items():
+            snapshot.setdefault(name, []).append({"labels": dict(labels), "value": self.value(instrument)})
+        return snapshot
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def to_prometheus(self):
+        lines = []
+        described = set()
+        for (name, labels), instrument in self.instruments.items():
+            if name not in described:
+                kind, description = self.descriptions[name]
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                described.add(name)
+            value = self.value(instrument)
+            if isinstance(instrument, Histogram):
+                for bucket, count in value["buckets"].items():
+                    lines.append(f"{name}_bucket{self.format_labels(labels, (('le', bucket),))} {count}")
+                lines.append(f"{name}_sum{self.format_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{self.format_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{self.format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path=None, export_format=None):
+        path = path or self.export_path
+        export_format = export_format or self.export_format
+        if export_format == "json":
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+        else:
+            content = self.to_prometheus()
+        # Файл заменяется целиком, чтобы сборщик никогда не прочитал его наполовину записанным
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as output_file:
+            output_file.write(content)
+        os.replace(temporary_path, path)
+
+class EventProfiler:
+    # Необязательный хук календаря: время обработчика каждого события по типам событий
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.histograms = {}
+
+    def record(self, event_type, seconds):
+        histogram = self.histograms.get(event_type)
+        if histogram is None:
+            histogram = self.histograms[event_type] = self.metrics.histogram(
+                "artschool_event_handler_seconds", "Время обработки события календаря (с)",
+                Metrics.EVENT_SECONDS_BUCKETS, event=event_type,
+            )
+        histogram.observe(seconds)
+
+LogEntry = namedtuple(
+    "LogEntry", ("sequence", "time", "level", "source", "action", "details", "args", "queue_length")
+)
 
 class ActionLogger:
-    log = []
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING"}
+
+    MAX_ENTRIES = 100
+
+    HEADER = (
+        "Source            | Action                         | Details                                            | Queue Length\n"
+        + "-" * 130
+    )
+
+    def __init__(self, simulation, max_entries=MAX_ENTRIES):
+        self.simulation = simulation
+        self.log = deque(maxlen=max_entries)
+        self.sequence = 0
+        self.min_level = self.INFO
+        self.muted_sources = set()
+        self.sink = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["sink"] = None
+        return state
+
+    def add_entry(self, source, action, details, args=(), level=INFO):
+        # Отфильтрованные события отбрасываются до создания записи;
+        # текст записи собирается только при чтении журнала
+        if level < self.min_level or source in self.muted_sources:
+            return
+
+        self.sequence += 1
+        entry = LogEntry(
+            self.sequence, self.simulation.clock.now(), level, source, action, details, args,
+            len(self.simulation.queue.applications)
+        )
+        self.log.append(entry)
+        if self.sink is not None:
+            self.sink.put(entry)
+
+    def configure(self, max_entries=None, min_level=None, muted_sources=None):
+        if max_entries is not None:
+            self.log = deque(self.log, maxlen=max_entries)
+        if min_level is not None:
+            self.min_level = min_level
+        if muted_sources is not None:
+            self.muted_sources = set(muted_sources)
+
+    def attach_sink(self, sink):
+        self.sink = sink
+        sink.start()
+
+    def detach_sink(self):
+        sink, self.sink = self.sink, None
+        if sink is not None:
+            sink.close()
 
-    @classmethod
-    def add_entry(cls, source, action, details):
-        queue_state = ", ".join(
-            [f"{app.student.name}({app.course.title})" for app in ApplicationQueue.applications]
-        ) or "Очередь пуста"
-        entry = {
-            "source": source,
-            "action": action,
-            "details": details,
-            "queue_state": queue_state,
-        }
-        cls.log.append(entry)
-        if len(cls.log) > 100:
-            cls.log.pop(0)
+    @staticmethod
+    def format_details(entry):
+        return entry.details.format(*entry.args) if entry.args else entry.details
 
     @classmethod
-    def get_log(cls):
-        formatted_log = (
-            "Source            | Action                         | Details                                            | Queue State\n"
-        )
-        formatted_log += "-" * 130 + "\n"
+    def format_entry(cls, entry):
+        return f"{entry.source:<17} | {entry.action:<30} | {cls.format_details(entry):<50} | {entry.queue_length:<12}"
+
+    def get_log(self):
+        return self.HEADER + "\n" + "\n".join(self.format_entry(entry) for entry in self.log) + "\n"
+
+    def entries_since(self, sequence):
+        # Идём от конца кольцевого буфера к первой уже показанной записи. Индексация deque
+        # не ломается от параллельной записи, а возможные повторы убираются по номеру
+        log = self.log
+        entries = {}
+        index = -1
+        try:
+            while True:
+                entry = log[index]
+                if entry.sequence <= sequence:
+                    break
+                entries[entry.sequence] = entry
+                index -= 1
+        except IndexError:
+            pass
+        return [entries[key] for key in sorted(entries)]
+
+class ActionLogSink(Thread):
+    # Фоновая запись полного журнала пачками в JSONL или двоичный файл
+    BINARY_HEADER = b"ARTSCHOOL-LOG\x01"
+    BINARY_RECORD = struct.Struct("<QdBI")
+    BINARY_STRING = struct.Struct("<H")
+
+    def __init__(self, path, log_format="jsonl", batch_size=1000, flush_interval=0.5):
+        super().__init__(daemon=True)
+        if log_format not in ("jsonl", "binary"):
+            raise ValueError(f"Неизвестный формат журнала: {log_format}")
+        self.path = path
+        self.log_format = log_format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.entries = SimpleQueue()
+        self.stopping = Event()
+
+    def put(self, entry):
+        self.entries.put(entry)
+
+    def close(self):
+        self.stopping.set()
+        self.join()
+
+    def run(self):
+        encode = self.encode_jsonl if self.log_format == "jsonl" else self.encode_binary
+        with open(self.path, "wb") as output:
+            if self.log_format == "binary":
+                output.write(self.BINARY_HEADER)
+            while True:
+                batch = self.next_batch()
+                if batch:
+                    output.write(b"".join(encode(entry) for entry in batch))
+                elif self.stopping.is_set():
+                    break
+
+    def next_batch(self):
+        batch = []
+        try:
+            batch.append(self.entries.get(timeout=self.flush_interval))
+        except Empty:
+            return batch
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.entries.get_nowait())
+            except Empty:
+                break
+        return batch
 
-        for entry in cls.log:
-            formatted_log += f"{entry['source']:<17} | {entry['action']:<30} | {entry['details']:<50} | {entry['queue_state']:<40}\n"
+    @staticmethod
+    def encode_jsonl(entry):
+        record = {
+            "sequence": entry.sequence,
+            "time": entry.time,
+            "level": ActionLogger.LEVEL_NAMES.get(entry.level, entry.level),
+            "source": entry.source,
+            "action": entry.action,
+            "details": ActionLogger.format_details(entry),
+            "queue_length": entry.queue_length,
+        }
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
 
-        return formatted_log
+    @classmethod
+    def encode_binary(cls, entry):
+        parts = [cls.BINARY_RECORD.pack(entry.sequence, entry.time, entry.level, entry.queue_length)]
+        for text in (entry.source, entry.action, ActionLogger.format_details(entry)):
+            encoded = text.encode("utf-8")[:0xFFFF]
+            parts.append(cls.BINARY_STRING.pack(len(encoded)))
+            parts.append(encoded)
+        return b"".join(parts)
 
 class Student:
     def __init__(self, name, student_id):
@@ -53,31 +581,49 @@ class Student:
         return (self.refusals / self.applications_sent * 100) if self.applications_sent > 0 else 0.0
 
 class Application:
-    application_counter = 1
+    __slots__ = (
+        "student",
+        "course",
+        "status",
+        "id",
+        "created_time",
+        "waiting_start_time",
+        "waiting_completed_time",
+        "service_start_time",
+        "service_completed_time",
+        "record",
+        "simulation",
+    )
 
     def __init__(self, student, course):
+        self.simulation = course.simulation
         self.student = student
         self.course = course
         self.status = "waiting"
-        self.id = Application.application_counter
-        self.created_time = time.time()
+        self.id = self.simulation.next_application_id()
+        self.created_time = self.simulation.clock.now()
         self.waiting_start_time = None
         self.waiting_completed_time = None
         self.service_start_time = None
         self.service_completed_time = None
-        Application.application_counter += 1
+        self.record = None
 
     def submit(self):
-        ActionLogger.add_entry(
+        self.simulation.logger.add_entry(
             source="Student",
             action="Заявка отправлена",
-            details=f"Заявка {self.id}({self.student.name}) отправлена на курс {self.course.title}"
+            details="Заявка {}({}) отправлена на курс {}",
+            args=(self.id, self.student.name, self.course.title)
         )
-        ApplicationQueue.total_applications += 1
+        self.simulation.queue.total_applications += 1
+        self.simulation.queue.submitted_counter.inc()
+        self.simulation.queue.register(self)
+        self.start_waiting_process()
         self.course.receive_application(self)
 
     def start_waiting_process(self):
-        self.waiting_start_time = time.time()
+        self.waiting_start_time = self.simulation.clock.now()
+        self.simulation.queue.records.store(self)
         # ActionLogger.add_entry(
         #     source="Application",
         #     action="Начало ожидания заявки",
@@ -85,7 +631,12 @@ class Application:
         # )
 
     def complete_waiting_process(self):
-        self.waiting_completed_time = time.time()
+        self.waiting_completed_time = self.simulation.clock.now()
+        if self.status == "accepted":
+            waiting_time = self.waiting_completed_time - self.waiting_start_time
+            self.simulation.queue.time_statistics.record_waiting(self, waiting_time)
+            self.simulation.queue.dispatch_latency.observe(waiting_time)
+        self.simulation.queue.records.store(self)
         # ActionLogger.add_entry(
         #     source="Application",
         #     action="Завершение ожидания заявки",
@@ -93,7 +644,8 @@ class Application:
         # )
 
     def start_service_process(self):
-        self.service_start_time = time.time()
+        self.service_start_time = self.simulation.clock.now()
+        self.simulation.queue.records.store(self)
         # ActionLogger.add_entry(
         #     source="Application",
         #     action="Начало обслуживания заявки",
@@ -104,8 +656,14 @@ class Application:
         if self.service_start_time is None:
             raise ValueError(f"Время начала обслуживания заявки для {self.id} не установлено.")
 
-        self.service_completed_time = time.time()
+        self.service_completed_time = self.simulation.clock.now()
+        self.status = "completed"
         service_time = self.service_completed_time - self.service_start_time
+        system_time = self.service_completed_time - self.waiting_start_time
+        self.simulation.queue.time_statistics.record_service(self, service_time, system_time)
+        self.simulation.queue.system_time_histogram.observe(system_time)
+        self.simulation.queue.records.store(self)
+        self.simulation.queue.release(self)
         #details = f"Заявка {self.id} ({self.student.name}) завершено обслуживание заявки на курсе {self.course.title} в {service_time:.2f} секунд"
 
         # ActionLogger.add_entry(
@@ -116,25 +674,35 @@ class Application:
 
     def cancel(self):
         self.status = "cancelled"
+        if self.record is not None:
+            self.simulation.queue.records.store(self)
+        self.simulation.queue.release(self)
 
 class Course:
     def __init__(self, title, capacity, school=None):
         self.title = title
         self.capacity = capacity
         self.enrolled_students = []
+        self.enrolled_positions = {}
         self.teacher = None
         self.school = school
+        self.simulation = school.simulation if school else None
 
     def check_availability(self):
         return len(self.enrolled_students) < self.capacity
 
+    def is_enrolled(self, student):
+        return student in self.enrolled_positions
+
     def enroll(self, student, application=None):
         if self.check_availability():
+            self.enrolled_positions[student] = len(self.enrolled_students)
             self.enrolled_students.append(student)
-            ActionLogger.add_entry(
+            self.simulation.logger.add_entry(
                 source="Course",
                 action="Студент записан",
-                details=f"Студент {student.name} на курс {self.title}"
+                details="Студент {} на курс {}",
+                args=(student.name, self.title)
             )
 
             return True
@@ -142,255 +710,1107 @@ class Course:
 
     def assign_teacher(self, teacher):
         self.teacher = teacher
-        self.teacher.start_work_on_courses[self.title] = time.time()
-        print(f"{teacher.name} назначен {teacher.start_work_on_courses} на курс {self.title}")
-        ActionLogger.add_entry(
+        teacher.start_course(self.title, self.simulation.clock.now())
+        self.simulation.logger.add_entry(
             source="Course",
             action="Назначен преподаватель",
-            details=f"Преподаватель {teacher.name} назначен на курс {self.title}"
+            details="Преподаватель {} назначен на курс {}",
+            args=(teacher.name, self.title)
         )
 
     def receive_application(self, application):
         if self.check_availability():
             if self.enroll(application.student):
                 application.status = "accepted"
-                ApplicationQueue.processed_applications.append(application)
+                application.complete_waiting_process()
+                application.start_service_process()
                 if not self.teacher and self.school:
                     self.school.assign_next_teacher(self)
         else:
-            ApplicationQueue.add(application)
+            self.simulation.queue.add(application)
+
+    def release_student(self, student):
+        # Удаление за O(1): на место удаляемого студента ставим последнего в списке
+        position = self.enrolled_positions.pop(student)
+        last_student = self.enrolled_students.pop()
+        if last_student is not student:
+            self.enrolled_students[position] = last_student
+            self.enrolled_positions[last_student] = position
 
     def remove_random_student(self):
         if self.enrolled_students:
-            student = random.choice(self.enrolled_students)
-            self.enrolled_students.remove(student)
-            ActionLogger.add_entry(
+            student = self.simulation.random.choose("departure_student", self.enrolled_students)
+            self.remove_student(student)
+            return student
+        return None
+
+    def remove_student(self, student):
+        self.release_student(student)
+        self.simulation.logger.add_entry(
+            source="Course",
+            action="Студент удален",
+            details="Студент {} был удален с курса {}",
+            args=(student.name, self.title)
+        )
+
+        related_application = self.simulation.queue.find_application(student, self)
+        if related_application and related_application.status == "accepted":
+            related_application.complete_service_process()
+        else:
+            self.simulation.logger.add_entry(
                 source="Course",
-                action="Студент удален",
-                details=f"Студент {student.name} был удален с курса {self.title}"
+                action="Заявка не найдена",
+                details="Связанная заявка для студента {} не найдена",
+                args=(student.name,),
+                level=ActionLogger.WARNING
             )
 
-            related_application = next(
-                (
-                    app
-                    for app in ApplicationQueue.applications + ApplicationQueue.processed_applications
-                    if app.student == student and app.course.title == self.title
-                ),
-                None
-            )
-            if related_application:
-                related_application.complete_service_process()
-                #print(f"Лог заявки: {ActionLogger.log[-1]}")
-            else:
-                print(f"Связанная заявка для студента {student.name} не найдена.")
+        self.simulation.queue.dispatch_course(self)
 
     def remove_teacher(self, school):
         if self.teacher:
             removed_teacher = self.teacher
-            end_time = time.time()
-            self.teacher.end_work_on_courses[self.title] = end_time
-            print(f"{self.teacher.name} удален {self.teacher.end_work_on_courses} c курсa {self.title}")
-
-            if self.title in self.teacher.start_work_on_courses:
-                start_time = self.teacher.start_work_on_courses[self.title]
-                self.teacher.time_intervals.append((start_time, end_time))
-                print(f"Добавлен интервал работы преподавателя {removed_teacher.name}: {self.teacher.start_work_on_courses} и {self.teacher.end_work_on_courses}")
-                difference = end_time - start_time
-                print(f"Протяженность интервала {difference}")
+            school.teacher_intervals.observe(removed_teacher.finish_course(self.title, self.simulation.clock.now()))
 
             self.teacher = None #############################
-            ActionLogger.add_entry(
+            school.busy_courses -= 1
+            self.simulation.logger.add_entry(
                 source="Course",
                 action="Преподаватель удалён",
-                details=f"Преподаватель {removed_teacher.name} был удалён с курса {self.title}"
+                details="Преподаватель {} был удалён с курса {}",
+                args=(removed_teacher.name, self.title)
             )
             school.assign_next_teacher(self)
+            school.release_teacher(removed_teacher)
+
+class P2Quantile:
+    # Оценка квантиля алгоритмом P² (Jain, Chlamtac): пять маркеров вместо хранения всех значений
+    def __init__(self, quantile):
+        self.quantile = quantile
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * quantile, 1 + 4 * quantile, 3 + 2 * quantile, 5]
+        self.increments = [0, quantile / 2, quantile, (1 + quantile) / 2, 1]
+
+    def add(self, value):
+        heights = self.heights
+        if len(heights) < 5:
+            bisect.insort(heights, value)
+            return
+
+        if value < heights[0]:
+            heights[0] = value
+            k = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            k = 3
+        else:
+            k = bisect.bisect_right(heights, value) - 1
+
+        positions = self.positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in range(1, 4):
+            offset = self.desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self.parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def parabolic(self, i, step):
+        heights, positions = self.heights, self.positions
+        return heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+            (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i]) / (positions[i + 1] - positions[i])
+            + (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1]) / (positions[i] - positions[i - 1])
+        )
+
+    def value(self):
+        if not self.heights:
+            return 0.0
+        if len(self.heights) < 5:
+            return self.heights[min(len(self.heights) - 1, int(self.quantile * len(self.heights)))]
+        return self.heights[2]
+
+class RunningStatistics:
+    DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, quantiles=DEFAULT_QUANTILES):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.quantiles = {quantile: P2Quantile(quantile) for quantile in quantiles}
+
+    def add(self, value):
+        # Алгоритм Уэлфорда: среднее и дисперсия за один проход
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+        for estimator in self.quantiles.values():
+            estimator.add(value)
+
+    def merge(self, other):
+        # Объединение с другой выборкой (формула Чана); оценки квантилей не объединяются
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        if self.minimum is None or other.minimum < self.minimum:
+            self.minimum = other.minimum
+        if self.maximum is None or other.maximum > self.maximum:
+            self.maximum = other.maximum
+
+    def variance(self):
+        return self.m2 / self.count if self.count > 0 else 0.0
+
+    def sample_variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def quantile(self, quantile):
+        return self.quantiles[quantile].value()
+
+    def as_dict(self):
+        summary = {
+            "count": self.count,
+            "mean": self.mean,
+            "variance": self.variance(),
+            "min": self.minimum or 0.0,
+            "max": self.maximum or 0.0,
+        }
+        for quantile, estimator in self.quantiles.items():
+            summary[f"p{quantile * 100:g}"] = estimator.value()
+        return summary
+
+class TimeStatistics:
+    def __init__(self, track_courses=False, track_students=False):
+        self.waiting = RunningStatistics()
+        self.service = RunningStatistics()
+        self.system = RunningStatistics()
+        self.track_courses = track_courses
+        self.track_students = track_students
+        self.by_course = {}
+        self.by_student = {}
+
+    def breakdowns(self, application):
+        # Разбивки по курсам и студентам хранят только моменты, без квантилей
+        if self.track_courses:
+            yield self.by_course.setdefault(application.course.title, self.new_breakdown())
+        if self.track_students:
+            yield self.by_student.setdefault(application.student.name, self.new_breakdown())
+
+    @staticmethod
+    def new_breakdown():
+        return {"waiting": RunningStatistics(()), "service": RunningStatistics(()), "system": RunningStatistics(())}
+
+    def record_waiting(self, application, waiting_time):
+        self.waiting.add(waiting_time)
+        for breakdown in self.breakdowns(application):
+            breakdown["waiting"].add(waiting_time)
+
+    def record_service(self, application, service_time, system_time):
+        self.service.add(service_time)
+        self.system.add(system_time)
+        for breakdown in self.breakdowns(application):
+            breakdown["service"].add(service_time)
+            breakdown["system"].add(system_time)
+
+    def as_dict(self):
+        summary = {
+            "waiting": self.waiting.as_dict(),
+            "service": self.service.as_dict(),
+            "system": self.system.as_dict(),
+        }
+        if self.track_courses:
+            summary["by_course"] = {
+                title: {name: stats.as_dict() for name, stats in breakdown.items()}
+                for title, breakdown in self.by_course.items()
+            }
+        if self.track_students:
+            summary["by_student"] = {
+                name: {metric: stats.as_dict() for metric, stats in breakdown.items()}
+                for name, breakdown in self.by_student.items()
+            }
+        return summary
+
+class RecordAggregate:
+    # Свёртка вытесненных строк: число заявок по статусам и моменты длительностей
+    __slots__ = ("statuses", "waiting", "service", "system")
+
+    def __init__(self):
+        self.statuses = [0] * len(ApplicationRecords.STATUSES)
+        self.waiting = RunningStatistics(())
+        self.service = RunningStatistics(())
+        self.system = RunningStatistics(())
+
+    def add(self, status, durations):
+        self.statuses[status] += 1
+        for name, value in durations:
+            if not math.isnan(value):
+                getattr(self, name).add(value)
+
+    def merge(self, other):
+        for status, count in enumerate(other.statuses):
+            self.statuses[status] += count
+        for name in ("waiting", "service", "system"):
+            getattr(self, name).merge(getattr(other, name))
+
+    def as_dict(self):
+        # Статус "waiting" и время ожидания хранятся под разными ключами, чтобы не затирать друг друга
+        summary = {"statuses": dict(zip(ApplicationRecords.STATUSES, self.statuses))}
+        for name in ("waiting", "service", "system"):
+            statistics = getattr(self, name)
+            summary[name + "_time"] = {
+                "count": statistics.count, "mean": statistics.mean, "variance": statistics.variance()
+            }
+        return summary
+
+class ApplicationRecords:
+    # Колоночное хранилище заявок: целочисленные id и коды статусов вместо ссылок на объекты,
+    # отметки времени в массивах float64; место выделяется блоками по CHUNK_SIZE строк.
+    # С ограничением retention в деталях хранятся только последние завершённые заявки: остальные
+    # сворачиваются в итоги по курсам и студентам и при необходимости дописываются в CSV-файл
+    CHUNK_SIZE = 4096
+    STATUSES = ("waiting", "accepted", "refused", "completed", "cancelled")
+    STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+    FINAL_CODES = frozenset(
+        code for status, code in STATUS_CODES.items() if status in ("refused", "completed", "cancelled")
+    )
+    TIME_COLUMNS = (
+        "created_time",
+        "waiting_start_time",
+        "waiting_completed_time",
+        "service_start_time",
+        "service_completed_time",
+    )
+    DURATIONS = (
+        ("waiting", "waiting_start_time", "service_start_time"),
+        ("service", "service_start_time", "service_completed_time"),
+        ("system", "waiting_start_time", "service_completed_time"),
+    )
+
+    def __init__(self, retention=None, spill_path=None):
+        self.size = 0
+        self.capacity = 0
+        self.application_ids = array("q")
+        self.student_ids = array("i")
+        self.course_ids = array("i")
+        self.statuses = array("b")
+        self.times = {column: array("d") for column in self.TIME_COLUMNS}
+        self.course_codes = {}
+        self.courses = []
+        self.student_names = {}
+
+        self.retention = retention
+        self.spill_path = spill_path
+        self.finished = 0
+        self.evicted = RecordAggregate()
+        self.evicted_count = 0
+        self.evicted_by_course = {}
+        self.evicted_by_student = {}
+
+    def __len__(self):
+        return self.size
+
+    def grow(self):
+        self.application_ids.extend(array("q", bytes(8 * self.CHUNK_SIZE)))
+        self.student_ids.extend(array("i", bytes(4 * self.CHUNK_SIZE)))
+        self.course_ids.extend(array("i", bytes(4 * self.CHUNK_SIZE)))
+        self.statuses.extend(array("b", bytes(self.CHUNK_SIZE)))
+        empty_times = array("d", [math.nan]) * self.CHUNK_SIZE
+        for column in self.times.values():
+            column.extend(empty_times)
+        self.capacity += self.CHUNK_SIZE
+
+    def course_code(self, course):
+        code = self.course_codes.get(course)
+        if code is None:
+            code = self.course_codes[course] = len(self.courses)
+            self.courses.append(course.title)
+        return code
+
+    def store(self, application):
+        row = application.record
+        if row is None:
+            if self.size == self.capacity:
+                self.grow()
+            row = application.record = self.size
+            self.size += 1
+            self.application_ids[row] = application.id
+            self.student_ids[row] = application.student.id
+            self.course_ids[row] = self.course_code(application.course)
+            self.student_names[application.student.id] = application.student.name
+        elif self.statuses[row] in self.FINAL_CODES:
+            self.finished -= 1
+
+        status = self.STATUS_CODES[application.status]
+        self.statuses[row] = status
+        if status in self.FINAL_CODES:
+            self.finished += 1
+        for column in self.TIME_COLUMNS:
+            value = getattr(application, column)
+            self.times[column][row] = math.nan if value is None else value
+        return row
+
+    def row(self, row):
+        record = {
+            "id": self.application_ids[row],
+            "student_id": self.student_ids[row],
+            "course": self.courses[self.course_ids[row]],
+            "status": self.STATUSES[self.statuses[row]],
+        }
+        for column in self.TIME_COLUMNS:
+            value = self.times[column][row]
+            record[column] = None if math.isnan(value) else value
+        return record
+
+    def column(self, name):
+        source = self.times[name] if name in self.times else getattr(self, name)
+        return memoryview(source)[:self.size]
+
+    def needs_compaction(self):
+        # Вытеснение идёт пачками: строки копируются, когда завершённых заявок больше удвоенного окна
+        # плюс число живых строк (ожидающие и обслуживаемые заявки). Пачка не меньше числа
+        # оставляемых строк, поэтому стоимость копирования на одну заявку остаётся постоянной
+        return self.retention is not None and self.finished > 2 * self.retention + self.size - self.finished
+
+    def compact(self, live_applications):
+        finished_rows = [row for row in range(self.size) if self.statuses[row] in self.FINAL_CODES]
+        evicted_rows = finished_rows[:len(finished_rows) - self.retention]
+        if not evicted_rows:
+            return
+
+        for row in evicted_rows:
+            self.fold(row)
+        if self.spill_path:
+            self.spill(evicted_rows)
+
+        evicted = set(evicted_rows)
+        kept_rows = [row for row in range(self.size) if row not in evicted]
+        self.application_ids = array("q", (self.application_ids[row] for row in kept_rows))
+        self.student_ids = array("i", (self.student_ids[row] for row in kept_rows))
+        self.course_ids = array("i", (self.course_ids[row] for row in kept_rows))
+        self.statuses = array("b", (self.statuses[row] for row in kept_rows))
+        for name, column in self.times.items():
+            self.times[name] = array("d", (column[row] for row in kept_rows))
+        self.size = self.capacity = len(kept_rows)
+        self.finished -= len(evicted_rows)
+
+        # Живые заявки ссылаются на свои строки по номеру - номера сдвигаются вместе со строками
+        positions = {row: position for position, row in enumerate(kept_rows)}
+        for application in live_applications:
+            if application.record is not None:
+                application.record = positions[application.record]
+
+    def row_durations(self, row):
+        return [
+            (name, self.times[end_column][row] - self.times[start_column][row])
+            for name, start_column, end_column in self.DURATIONS
+        ]
+
+    def fold(self, row):
+        status = self.statuses[row]
+        durations = self.row_durations(row)
+        self.evicted.add(status, durations)
+        self.evicted_count += 1
+        course = self.course_ids[row]
+        if course not in self.evicted_by_course:
+            self.evicted_by_course[course] = RecordAggregate()
+        self.evicted_by_course[course].add(status, durations)
+        student = self.student_ids[row]
+        if student not in self.evicted_by_student:
+            self.evicted_by_student[student] = RecordAggregate()
+        self.evicted_by_student[student].add(status, durations)
+
+    def spill(self, rows):
+        # Файл не держится открытым: вытеснение редкое, а хранилище должно сохраняться в контрольной точке
+        with open(self.spill_path, "a" if self.evicted_count > len(rows) else "w", newline="",
+                  encoding="utf-8") as spill_file:
+            writer = csv.DictWriter(spill_file, fieldnames=("id", "student_id", "course", "status",
+                                                            *self.TIME_COLUMNS))
+            if self.evicted_count == len(rows):
+                writer.writeheader()
+            writer.writerows(self.row(row) for row in rows)
+
+    def nbytes(self):
+        columns = [self.application_ids, self.student_ids, self.course_ids, self.statuses, *self.times.values()]
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def durations(self, start_column, end_column):
+        start = self.column(start_column)
+        end = self.column(end_column)
+        if np is not None:
+            values = np.frombuffer(end, dtype=np.float64) - np.frombuffer(start, dtype=np.float64)
+            return values[~np.isnan(values)]
+        return [finish - begin for begin, finish in zip(start, end) if not math.isnan(finish - begin)]
+
+    def column_statistics(self, breakdown=False):
+        # Пересчёт по колонкам целиком: в векторном виде при наличии NumPy, иначе одним проходом.
+        # Итоги вытесненных строк добавляются, поэтому статистика охватывает всю историю
+        summary = {"count": self.size + self.evicted_count, "retained": self.size, "bytes": self.nbytes()}
+        for name, start_column, end_column in self.DURATIONS:
+            values = self.durations(start_column, end_column)
+            folded = getattr(self.evicted, name)
+            if np is not None and not folded.count:
+                summary[name] = {
+                    "count": int(values.size),
+                    "mean": float(values.mean()) if values.size else 0.0,
+                    "variance": float(values.var()) if values.size else 0.0,
+                }
+                continue
+            statistics = RunningStatistics(())
+            for value in values:
+                statistics.add(value)
+            statistics.merge(folded)
+            summary[name] = {"count": statistics.count, "mean": statistics.mean, "variance": statistics.variance()}
+
+        if breakdown:
+            summary["by_course"] = {
+                self.courses[course]: aggregate.as_dict()
+                for course, aggregate in self.group_statistics(self.course_ids, self.evicted_by_course).items()
+            }
+            summary["by_student"] = {
+                self.student_names[student]: aggregate.as_dict()
+                for student, aggregate in self.group_statistics(self.student_ids, self.evicted_by_student).items()
+            }
+        return summary
+
+    def group_statistics(self, keys, evicted):
+        # Сохранённые строки сворачиваются во временные итоги, к которым добавляются вытесненные
+        groups = {}
+        for row in range(self.size):
+            key = keys[row]
+            if key not in groups:
+                groups[key] = RecordAggregate()
+            groups[key].add(self.statuses[row], self.row_durations(row))
+        for key, folded in evicted.items():
+            groups.setdefault(key, RecordAggregate()).merge(folded)
+        return groups
+
+class ApplicationBuffer:
+    # Общий интерфейс дисциплин буфера: постановка заявки (place), выбор заявки на отказ при
+    # переполнении (pop_rejected) и выбор заявки для курса, на котором освободилось место
+    # (pop_next_for_course); заявка может попасть только на свой курс, поэтому других выборов
+    # на обслуживание нет. Заявки хранятся в словаре по id, а структуры порядка удаляются
+    # лениво: запись без живой заявки пропускается при чтении, а когда записей становится больше
+    # удвоенного числа живых заявок, структуры перестраиваются
+    def __init__(self):
+        self.entries = {}
+        self.placed = 0
+        self.reset()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    def __contains__(self, application):
+        return application.id in self.entries
+
+    def add(self, application):
+        self.entries[application.id] = application
+        self.place(application)
+        self.placed += 1
+
+    def taken(self, application):
+        if application is not None:
+            self.compact()
+        return application
+
+    def compact(self):
+        if self.placed > 2 * len(self.entries) + 32:
+            self.reset()
+            for application in self.entries.values():
+                self.place(application)
+            self.placed = len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.placed = 0
+        self.reset()
+
+    def reset(self):
+        raise NotImplementedError
+
+    def place(self, application):
+        raise NotImplementedError
+
+    def pop_rejected(self):
+        raise NotImplementedError
+
+    def pop_next_for_course(self, course):
+        raise NotImplementedError
+
+    def waiting_courses(self):
+        raise NotImplementedError
+
+class SourceRefusalBuffer(ApplicationBuffer):
+    # Дисциплина по умолчанию: обслуживание в порядке поступления, при переполнении отказ получает
+    # заявка студента с наибольшим id (а среди них самая ранняя). Кучи дают O(log n) для обоих выборов
+    def reset(self):
+        self.eviction_heap = []
+        self.course_heaps = {}
+
+    def place(self, application):
+        heapq.heappush(self.eviction_heap, (-application.student.id, application.id))
+        heapq.heappush(self.course_heaps.setdefault(application.course, []), application.id)
+
+    def pop_rejected(self):
+        while self.eviction_heap:
+            application = self.entries.pop(heapq.heappop(self.eviction_heap)[1], None)
+            if application is not None:
+                return self.taken(application)
+        return None
+
+    def pop_next_for_course(self, course):
+        heap = self.course_heaps.get(course)
+        application = None
+        while heap and application is None:
+            application = self.entries.pop(heapq.heappop(heap), None)
+
+        if heap is not None and not heap:
+            del self.course_heaps[course]
+        return self.taken(application)
+
+    def waiting_courses(self):
+        return list(self.course_heaps)
+
+class DequeBuffer(ApplicationBuffer):
+    # Общая очередь и очереди по курсам на deque: обслуживание с одного конца, отказ - с другого
+    select_newest = False
+
+    def reset(self):
+        self.order = deque()
+        self.course_queues = {}
+
+    def place(self, application):
+        self.order.append(application.id)
+        self.course_queues.setdefault(application.course, deque()).append(application.id)
+
+    def pop_live(self, queue, newest):
+        while queue:
+            application = self.entries.pop(queue.pop() if newest else queue.popleft(), None)
+            if application is not None:
+                return application
+        return None
+
+    def pop_rejected(self):
+        return self.taken(self.pop_live(self.order, not self.select_newest))
+
+    def pop_next_for_course(self, course):
+        queue = self.course_queues.get(course)
+        application = self.pop_live(queue, self.select_newest)
+        if queue is not None and not queue:
+            del self.course_queues[course]
+        return self.taken(application)
+
+    def waiting_courses(self):
+        return list(self.course_queues)
+
+class FifoBuffer(DequeBuffer):
+    # Обслуживается самая ранняя заявка, при переполнении отказ получает только что поступившая
+    select_newest = False
+
+class LifoBuffer(DequeBuffer):
+    # Обслуживается самая поздняя заявка, при переполнении вытесняется самая ранняя
+    select_newest = True
+
+class SourcePriorityBuffer(ApplicationBuffer):
+    # Приоритет по источнику: меньший id студента - выше приоритет. Обслуживается заявка самого
+    # приоритетного студента (среди его заявок - ранняя), отказ получает самая поздняя заявка
+    # наименее приоритетного
+    def reset(self):
+        self.rejection_heap = []
+        self.course_heaps = {}
+
+    def place(self, application):
+        heapq.heappush(self.rejection_heap, (-application.student.id, -application.id))
+        heapq.heappush(self.course_heaps.setdefault(application.course, []), (application.student.id, application.id))
+
+    def pop_live(self, heap, sign=1):
+        while heap:
+            application = self.entries.pop(sign * heapq.heappop(heap)[1], None)
+            if application is not None:
+                return application
+        return None
+
+    def pop_rejected(self):
+        return self.taken(self.pop_live(self.rejection_heap, -1))
+
+    def pop_next_for_course(self, course):
+        heap = self.course_heaps.get(course)
+        application = self.pop_live(heap)
+        if heap is not None and not heap:
+            del self.course_heaps[course]
+        return self.taken(application)
+
+    def waiting_courses(self):
+        return list(self.course_heaps)
+
+class CourseBatchBuffer(ApplicationBuffer):
+    # Пакеты по курсам: заявки лежат в корзинах по курсам, освободившийся курс получает заявки своей
+    # корзины в порядке поступления. При переполнении отказ получает самая поздняя заявка из самой
+    # большой корзины, поэтому один популярный курс не вытесняет из буфера остальные. Размеры корзин
+    # считаются только по живым заявкам, самая большая корзина берётся из кучи с ленивым удалением
+    def reset(self):
+        self.buckets = {}
+        self.sizes = {}
+        self.size_heap = []
+        self.course_order = {}
+
+    def resize(self, course, delta):
+        size = self.sizes.get(course, 0) + delta
+        if size:
+            self.sizes[course] = size
+            order = self.course_order.setdefault(course, len(self.course_order))
+            heapq.heappush(self.size_heap, (-size, order, course))
+        else:
+            self.sizes.pop(course, None)
+
+    def place(self, application):
+        self.buckets.setdefault(application.course, deque()).append(application.id)
+        self.resize(application.course, 1)
+
+    def largest_bucket(self):
+        while self.size_heap:
+            size, _, course = self.size_heap[0]
+            if self.sizes.get(course) == -size:
+                return course
+            heapq.heappop(self.size_heap)
+        return None
+
+    def pop_from_bucket(self, course, newest=False):
+        bucket = self.buckets.get(course)
+        application = None
+        while bucket and application is None:
+            application = self.entries.pop(bucket.pop() if newest else bucket.popleft(), None)
+        if bucket is not None and not bucket:
+            del self.buckets[course]
+        if application is not None:
+            self.resize(course, -1)
+        return self.taken(application)
+
+    def pop_rejected(self):
+        course = self.largest_bucket()
+        return self.pop_from_bucket(course, newest=True) if course is not None else None
+
+    def pop_next_for_course(self, course):
+        return self.pop_from_bucket(course)
+
+    def waiting_courses(self):
+        return list(self.sizes)
+
+BUFFER_POLICIES = {
+    "default": SourceRefusalBuffer,
+    "fifo": FifoBuffer,
+    "lifo": LifoBuffer,
+    "priority": SourcePriorityBuffer,
+    "batch": CourseBatchBuffer,
+}
+
+def create_buffer(policy="default"):
+    if policy not in BUFFER_POLICIES:
+        raise ValueError(f"Неизвестная дисциплина буфера '{policy}'")
+    return BUFFER_POLICIES[policy]()
 
 class ApplicationQueue:
-    applications = []
-    processed_applications = []
     MAX_QUEUE_SIZE = 10
 
-    total_applications = 0
-    total_refusals = 0
+    def __init__(self, simulation, max_size=MAX_QUEUE_SIZE, time_statistics=None, buffer_policy="default",
+                 records=None):
+        self.simulation = simulation
+        self.max_size = max_size
+        self.buffer_policy = buffer_policy
+        self.applications = create_buffer(buffer_policy)
+        self.records = records if records is not None else ApplicationRecords()
+
+        # (id студента, курс) -> ожидающая или обслуживаемая заявка; завершённые заявки
+        # остаются только в колонках records, чтобы не удерживать объекты
+        self.application_index = {}
+
+        self.total_applications = 0
+        self.total_refusals = 0
+
+        self.statistics_time = None
+        self.time_statistics = time_statistics or TimeStatistics()
+
+        metrics = simulation.metrics
+        self.submitted_counter = metrics.counter("artschool_applications_total", "Поданные заявки")
+        self.refusal_counter = metrics.counter("artschool_refusals_total", "Заявки, вытесненные из буфера")
+        self.dispatch_counter = metrics.counter("artschool_dispatched_total", "Заявки, переданные из буфера на курс")
+        self.queue_length_histogram = metrics.histogram(
+            "artschool_queue_length", "Длина буфера при постановке заявки", Metrics.LENGTH_BUCKETS
+        )
+        self.dispatch_latency = metrics.histogram(
+            "artschool_dispatch_latency_seconds", "Время от подачи заявки до записи на курс (модельные с)"
+        )
+        self.system_time_histogram = metrics.histogram(
+            "artschool_time_in_system_seconds", "Время заявки в системе (модельные с)"
+        )
+        metrics.gauge_function("artschool_buffer_size", "Текущее число заявок в буфере", self.queue_length)
+
+    def queue_length(self):
+        return len(self.applications)
 
-    statistics_time = None
+    def register(self, application):
+        self.application_index[(application.student.id, application.course)] = application
 
-    @classmethod
-    def add(cls, application):
-        cls.applications.append(application)
+    def find_application(self, student, course):
+        return self.application_index.get((student.id, course))
+
+    def release(self, application):
+        key = (application.student.id, application.course)
+        if self.application_index.get(key) is application:
+            del self.application_index[key]
+        if self.records.needs_compaction():
+            self.records.compact(self.application_index.values())
 
-        ActionLogger.add_entry(
+    def is_waiting(self, student, course):
+        application = self.find_application(student, course)
+        return application is not None and application.status == "waiting"
+
+    def add(self, application):
+        self.applications.add(application)
+        self.queue_length_histogram.observe(len(self.applications))
+
+        self.simulation.logger.add_entry(
             source="ApplicationQueue",
             action="Заявка добавлена",
-            details=f"Заявка {application.id}({application.student.name}) добавлена в очередь"
+            details="Заявка {}({}) добавлена в очередь",
+            args=(application.id, application.student.name)
         )
 
-        if len(cls.applications) > cls.MAX_QUEUE_SIZE:
-            cls.remove_lowest_priority()
+        if len(self.applications) > self.max_size:
+            self.remove_lowest_priority()
 
-    @classmethod
-    def remove_lowest_priority(cls):
-        if cls.applications:
-            application_to_remove = max(cls.applications, key=lambda app: app.student.id)
+    def remove_lowest_priority(self):
+        application_to_remove = self.applications.pop_rejected()
+        if application_to_remove:
+            application_to_remove.status = "refused"
             application_to_remove.student.refusals += 1
+            self.refusal_counter.inc()
 
             application_to_remove.complete_waiting_process()
+            self.release(application_to_remove)
 
-            cls.applications.remove(application_to_remove)
-            cls.total_refusals += 1
+            self.total_refusals += 1
 
-            ActionLogger.add_entry(
+            self.simulation.logger.add_entry(
                 source="ApplicationQueue",
                 action="Заявка удалена",
-                details=f"Заявка {application_to_remove.id}({application_to_remove.student.name}) удалена из-за переполнения"
+                details="Заявка {}({}) удалена из-за переполнения",
+                args=(application_to_remove.id, application_to_remove.student.name)
             )
 
-    @classmethod
-    def get_refusals(cls):
-        refusal_rate = (cls.total_refusals / cls.total_applications * 100) if cls.total_applications > 0 else 0
-        return cls.total_applications, cls.total_refusals, refusal_rate
-
-    @classmethod
-    def notify_school(cls):
-        if cls.applications:
-            School.select_application()
-
-    @classmethod
-    def process_queue(cls):
-        cls.applications.sort(key=lambda app: app.id)
-
-        for application in cls.applications:
-            if application.course.check_availability():
-                application.course.receive_application(application)
-                application.complete_waiting_process()
-                ActionLogger.add_entry(
-                    source="ApplicationQueue",
-                    action="Заявка обработана",
-                    details=f"Заявка {application.id}({application.student.name}) из очереди записана на курс {application.course.title}"
-                )
-
-                cls.applications.remove(application)
-
-    @classmethod
-    def finalize_statistics(cls):
-        cls.statistics_time = time.time()
-
-    @staticmethod
-    def calculate_statistics():
-        total_waiting_time = 0
-        total_service_time = 0
-        processed_applications = 0
-
-        waiting_times = []
-        service_times = []
+    def get_refusals(self):
+        refusal_rate = (self.total_refusals / self.total_applications * 100) if self.total_applications > 0 else 0
+        return self.total_applications, self.total_refusals, refusal_rate
 
-        current_time = ApplicationQueue.statistics_time or time.time()
-
-        all_applications = ApplicationQueue.processed_applications + ApplicationQueue.applications
-
-        print("\n=== Начало расчета статистики ===")
-        print(f"Текущее время: {current_time}")
-        print(f"Всего заявок для обработки: {len(ApplicationQueue.processed_applications)} + {len(ApplicationQueue.applications)}")
+    def dispatch_course(self, course):
+        # Освободившиеся места занимают заявки этого курса в порядке поступления
+        while course.check_availability():
+            application = self.applications.pop_next_for_course(course)
+            if application is None:
+                break
 
-        for idx, application in enumerate(all_applications):
-            print(f"\n--- Обработка заявки {idx + 1} ---")
-            print(f"ID заявки: {application.id}, Студент: {application.student.name}, Курс: {application.course.title}")
+            self.dispatch_counter.inc()
+            application.course.receive_application(application)
+            self.simulation.logger.add_entry(
+                source="ApplicationQueue",
+                action="Заявка обработана",
+                details="Заявка {}({}) из очереди записана на курс {}",
+                args=(application.id, application.student.name, application.course.title)
+            )
 
-            if application.waiting_completed_time and application.waiting_start_time:
-                waiting_time = application.waiting_completed_time - application.waiting_start_time
-                print(
-                    f"Время ожидания завершено: {application.waiting_completed_time}, Начало: {application.waiting_start_time}, Итог: {waiting_time}")
-            else:
-                waiting_time = 0
-                print("Время ожидания не завершено, установлено в 0")
+    def process_queue(self):
+        for course in self.applications.waiting_courses():
+            if course.check_availability():
+                self.dispatch_course(course)
+
+    def finalize_statistics(self):
+        self.statistics_time = self.simulation.clock.now()
+
+    def calculate_statistics(self):
+        # Накопители обновляются при завершении ожидания и обслуживания, поэтому расчёт занимает O(1)
+        statistics = self.time_statistics
+        return (
+            statistics.waiting.mean,
+            statistics.service.mean,
+            statistics.waiting.variance(),
+            statistics.service.variance(),
+        )
 
-            if application.service_start_time and application.service_completed_time:
-                service_time = application.service_completed_time - application.service_start_time
-                print(
-                    f"Время обслуживания завершено: {application.service_completed_time}, Начало: {application.service_start_time}, Итог: {service_time}")
-            else:
-                service_time = 20
-                print("Время обслуживания не завершено, установлено в 20")
-
-            total_waiting_time += waiting_time
-            total_service_time += service_time
-            waiting_times.append(waiting_time)
-            service_times.append(service_time)
-            processed_applications += 1
-
-        print("\n=== Итоги обработки всех заявок ===")
-        print(f"Общее время ожидания: {total_waiting_time}")
-        print(f"Общее время обслуживания: {total_service_time}")
-        print(f"Обработано заявок: {processed_applications}")
-
-        if processed_applications > 0:
-            average_waiting_time = total_waiting_time / processed_applications
-            average_processing_time = total_service_time / processed_applications
-            variance_waiting_time = sum(
-                (wt - average_waiting_time) ** 2 for wt in waiting_times) / processed_applications
-            variance_processing_time = sum(
-                (st - average_processing_time) ** 2 for st in service_times) / processed_applications
-            print(f"Среднее время ожидания: {average_waiting_time}")
-            print(f"Среднее время обслуживания: {average_processing_time}")
-            print(f"Дисперсия время ожидания: {variance_waiting_time}")
-            print(f"Дисперсия время обслуживания: {variance_processing_time}")
-        else:
-            average_waiting_time = average_processing_time = variance_waiting_time = variance_processing_time = 0
-            print("Заявок для обработки не найдено.")
+ARRIVAL_INTERVAL = (2, 5)
+SERVICE_INTERVAL = 7
+DELAY_BEFORE_REMOVAL = 15
+LAMBDA_REMOVAL = 1 / 30
+
+class PythonRandomStreams:
+    # Запасной вариант без NumPy: все выборки идут из одного random.Random в порядке событий,
+    # поэтому прогон с тем же зерном повторяет прежние результаты
+    def __init__(self, seed, arrival_interval, lambda_removal):
+        self.random = random.Random(seed)
+        self.arrival_interval = tuple(arrival_interval)
+        self.lambda_removal = lambda_removal
+
+    def arrival_gap(self):
+        return self.random.randint(*self.arrival_interval)
+
+    def removal_interval(self):
+        return self.random.expovariate(self.lambda_removal)
+
+    def choose(self, stream, sequence):
+        return self.random.choice(sequence)
+
+class RandomBlock:
+    # Значения генерируются блоками и читаются по индексу; новый блок строится, когда текущий исчерпан
+    def __init__(self, generator, method, args, block_size):
+        self.generator = generator
+        self.method = method
+        self.args = args
+        self.block_size = block_size
+        self.values = []
+        self.position = 0
+
+    def next(self):
+        if self.position >= len(self.values):
+            self.values = getattr(self.generator, self.method)(*self.args, size=self.block_size).tolist()
+            self.position = 0
+        value = self.values[self.position]
+        self.position += 1
+        return value
+
+class NumpyRandomStreams:
+    # Отдельный поток NumPy Generator на каждый вид выборки: интервалы прибытия, выбор студента и курса,
+    # выбор отчисляемого, интервалы и курсы снятия преподавателя. Выбор из последовательности любой
+    # длины берётся из блока равномерных чисел на [0, 1)
+    BLOCK_SIZE = 4096
+    CHOICE_STREAMS = ("student", "course", "departure_course", "departure_student", "removed_teacher")
+
+    def __init__(self, seed, arrival_interval, lambda_removal, block_size=BLOCK_SIZE):
+        low, high = arrival_interval
+        arrival_generator, removal_generator, *choice_generators = (
+            np.random.default_rng(sequence)
+            for sequence in np.random.SeedSequence(seed).spawn(2 + len(self.CHOICE_STREAMS))
+        )
+        self.arrival_gaps = RandomBlock(arrival_generator, "integers", (low, high + 1), block_size)
+        self.removal_intervals = RandomBlock(removal_generator, "exponential", (1 / lambda_removal,), block_size)
+        self.choices = {
+            stream: RandomBlock(generator, "random", (), block_size)
+            for stream, generator in zip(self.CHOICE_STREAMS, choice_generators)
+        }
 
-        print("=== Конец расчета статистики ===\n")
+    def arrival_gap(self):
+        return self.arrival_gaps.next()
+
+    def removal_interval(self):
+        return self.removal_intervals.next()
+
+    def choose(self, stream, sequence):
+        return sequence[int(self.choices[stream].next() * len(sequence))]
+
+RANDOM_BACKENDS = ("auto", "numpy", "python")
+
+def create_random_streams(seed, arrival_interval, lambda_removal, backend="auto"):
+    if backend == "numpy" and np is None:
+        raise ValueError("Для генератора numpy нужен установленный пакет NumPy")
+    if backend == "numpy" or (backend == "auto" and np is not None):
+        return NumpyRandomStreams(seed, arrival_interval, lambda_removal)
+    return PythonRandomStreams(seed, arrival_interval, lambda_removal)
+
+class Simulation:
+    # Контекст одного прогона: очередь, журнал, календарь, часы, счётчик заявок и генератор
+    # случайных чисел. Несколько симуляций в одном процессе не влияют друг на друга
+    def __init__(self, seed=None, max_queue_size=ApplicationQueue.MAX_QUEUE_SIZE, log_size=ActionLogger.MAX_ENTRIES,
+                 time_statistics=None, arrival_interval=ARRIVAL_INTERVAL, lambda_removal=LAMBDA_REMOVAL,
+                 random_backend="auto", buffer_policy="default", metrics=None, records=None):
+        self.seed = seed
+        self.arrival_interval = tuple(arrival_interval)
+        self.lambda_removal = lambda_removal
+        self.random = create_random_streams(seed, arrival_interval, lambda_removal, random_backend)
+        self.clock = SimulationClock()
+        self.commands = CommandQueue()
+        self.metrics = metrics or Metrics()
+        self.calendar = EventCalendar(self.clock, self.commands)
+        if self.metrics.profile_events:
+            self.calendar.profiler = EventProfiler(self.metrics)
+        self.queue = ApplicationQueue(self, max_queue_size, time_statistics, buffer_policy, records)
+        self.logger = ActionLogger(self, log_size)
+        self.snapshots = StateSnapshots()
+        self.application_counter = 1
+        self.application_limit = None
+        self.trace_recorder = None
+
+    # Запись трассы привязана к открытому файлу и после восстановления из контрольной точки не продолжается
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["trace_recorder"] = None
+        return state
+
+    def next_application_id(self):
+        application_id = self.application_counter
+        self.application_counter += 1
+        return application_id
+
+class TeacherScheduler:
+    # Пул свободных преподавателей - куча с ленивым удалением: при каждом изменении преподавателя его
+    # версия растёт, а устаревшие записи отбрасываются при чтении вершины. Для политики subject_match
+    # такие же кучи ведутся по предметам. Курсы без преподавателя ждут в очереди и получают
+    # преподавателя, как только он освобождается
+    POLICIES = ("round_robin", "least_loaded", "subject_match")
+
+    def __init__(self, policy="round_robin", teacher_capacity=1):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Неизвестная политика назначения преподавателей '{policy}'")
+        self.policy = policy
+        self.teacher_capacity = teacher_capacity
+        self.free_teachers = []
+        self.free_by_subject = {}
+        self.waiting_courses = deque()
+        self.waiting = set()
+        self.order = {}
+        self.versions = {}
+        self.last_assigned = {}
+        self.assignment_ticket = 0
+
+    def is_free(self, teacher):
+        return not self.teacher_capacity or teacher.busy_course_count() < self.teacher_capacity
+
+    def priority(self, teacher):
+        if self.policy == "least_loaded":
+            return teacher.busy_course_count(), teacher.assignment_count
+        # round_robin и subject_match: первым идёт тот, кого назначали раньше всех
+        return self.last_assigned.get(teacher, -1),
 
-        return average_waiting_time, average_processing_time, variance_waiting_time, variance_processing_time
+    def add_teacher(self, teacher):
+        self.order[teacher] = len(self.order)
+        self.update(teacher)
+
+    def update(self, teacher):
+        version = self.versions[teacher] = self.versions.get(teacher, 0) + 1
+        if self.is_free(teacher):
+            entry = (self.priority(teacher), self.order[teacher], version, teacher)
+            heapq.heappush(self.free_teachers, entry)
+            if self.policy == "subject_match":
+                heapq.heappush(self.free_by_subject.setdefault(teacher.subject, []), entry)
+
+    def peek_free(self, heap):
+        while heap:
+            _, _, version, teacher = heap[0]
+            if version == self.versions[teacher] and self.is_free(teacher):
+                return teacher
+            heapq.heappop(heap)
+        return None
+
+    def select_teacher(self, course):
+        if self.policy == "subject_match":
+            teacher = self.peek_free(self.free_by_subject.get(course.title, []))
+            if teacher:
+                return teacher
+        return self.peek_free(self.free_teachers)
+
+    def assigned(self, teacher):
+        self.last_assigned[teacher] = self.assignment_ticket
+        self.assignment_ticket += 1
+        self.update(teacher)
+
+    def wait(self, course):
+        if course not in self.waiting:
+            self.waiting.add(course)
+            self.waiting_courses.append(course)
+
+    def next_waiting_course(self):
+        if self.waiting_courses:
+            course = self.waiting_courses.popleft()
+            self.waiting.discard(course)
+            return course
+        return None
 
 class School:
-    def __init__(self, name):
+    def __init__(self, name, simulation=None, teacher_policy="round_robin", teacher_capacity=1):
         self.name = name
+        self.simulation = simulation or Simulation()
         self.courses = []
         self.students = []
         self.teachers = []
-        self.teacher_index = 0
+        self.scheduler = TeacherScheduler(teacher_policy, teacher_capacity)
         self.total_assignments = 0
-        self.start_time = time.time()
+        # Число курсов, у которых есть преподаватель; меняется при назначении и снятии
+        self.busy_courses = 0
+        self.start_time = self.simulation.clock.now()
+
+        metrics = self.simulation.metrics
+        self.teacher_intervals = metrics.histogram(
+            "artschool_teacher_interval_seconds", "Продолжительность работы преподавателя на курсе (модельные с)"
+        )
+        metrics.gauge_function("artschool_busy_courses", "Курсы с назначенным преподавателем", self.get_busy_courses)
+
+    def add_course(self, course):
+        course.simulation = self.simulation
+        self.courses.append(course)
 
     def add_teacher(self, teacher):
         teacher.assignment_count = 0
+        teacher.simulation = self.simulation
         self.teachers.append(teacher)
+        self.scheduler.add_teacher(teacher)
 
     def assign_next_teacher(self, course):
-        if self.teachers:
-            teacher = self.teachers[self.teacher_index]
-            course.assign_teacher(teacher)
-
-            teacher.assignment_count += 1
-            self.total_assignments += 1
-
-            self.teacher_index = (self.teacher_index + 1) % len(self.teachers)
-            ActionLogger.add_entry(
-                source="School",
-                action="Преподаватель назначен",
-                details=f"Преподаватель {teacher.name} назначен на курс {course.title}"
-            )
+        if course.teacher is not None:
+            return
+        teacher = self.scheduler.select_teacher(course)
+        if teacher is None:
+            # Свободных преподавателей нет: курс ждёт освобождения
+            self.scheduler.wait(course)
+            return
+
+        self.busy_courses += 1
+        course.assign_teacher(teacher)
+
+        teacher.assignment_count += 1
+        self.total_assignments += 1
+        self.scheduler.assigned(teacher)
+        self.simulation.logger.add_entry(
+            source="School",
+            action="Преподаватель назначен",
+            details="Преподаватель {} назначен на курс {}",
+            args=(teacher.name, course.title)
+        )
 
-    @staticmethod
-    def select_application():
-        if ApplicationQueue.applications:
-            application = ApplicationQueue.applications.pop(0)
-            application.course.receive_application(application)
-            ActionLogger.add_entry(
-                source="School",
-                action="Заявка выбрана",
-                details=f"Заявка {application.student.id} выбрана для обработки"
-            )
+    def release_teacher(self, teacher):
+        # Освободившийся преподаватель сразу обслуживает ожидающие курсы
+        self.scheduler.update(teacher)
+        while self.scheduler.waiting_courses and self.scheduler.select_teacher(self.scheduler.waiting_courses[0]):
+            self.assign_next_teacher(self.scheduler.next_waiting_course())
+
+    def assign_teachers(self):
+        for course in self.courses:
+            self.assign_next_teacher(course)
 
     def get_teacher_utilization(self):
         utilization_data = {}
+        total_courses = len(self.courses)
         for teacher in self.teachers:
-            is_busy = any(course.teacher == teacher for course in self.courses)
-            total_courses = len(self.courses)
-            busy_courses = sum(1 for course in self.courses if course.teacher == teacher)
+            busy_courses = teacher.busy_course_count()
             utilization = (busy_courses / total_courses * 100) if total_courses > 0 else 0
-            utilization_data[teacher] = (is_busy, utilization)
+            utilization_data[teacher] = (busy_courses > 0, utilization)
         return utilization_data
 
     def get_teacher_utilization_ratios(self):
@@ -400,104 +1820,366 @@ class School:
             utilization_ratios[teacher.name] = ratio
         return utilization_ratios
 
+    def get_busy_courses(self):
+        return self.busy_courses
+
     def get_system_utilization(self):
         total_courses = len(self.courses)
-        busy_courses = sum(1 for course in self.courses if course.teacher is not None)
-        utilization = (busy_courses / total_courses * 100) if total_courses > 0 else 0
+        utilization = (self.busy_courses / total_courses * 100) if total_courses > 0 else 0
         return utilization
 
     def calculate_teacher_load(self):
-        teacher_load = {}
-        for teacher in self.teachers:
-            total_time_school = time.time() - self.start_time
-            print(f"Общее время работы школы: {total_time_school}")
-
-            merged_intervals = teacher.merge_intervals(teacher.time_intervals)
-            print(f"Объединённые интервалы для {teacher.name}: {merged_intervals}")
+        # Загрузка - доля времени работы школы, когда преподаватель ведёт хотя бы один курс
+        current_time = self.simulation.clock.now()
+        total_time_school = current_time - self.start_time
+        return {teacher.name: teacher.load(current_time, total_time_school) for teacher in self.teachers}
 
-            total_work_time = sum(end - start for start, end in merged_intervals)
-            print(f"Суммарное рабочее время преподавателя {teacher.name}: {total_work_time}")
-
-            idle_time = total_time_school - total_work_time
-            print(f"Idle time преподавателя {teacher.name}: {idle_time}")
-
-            load = (total_work_time / total_time_school) * 100 if total_time_school > 0 else 0
-            teacher_load[teacher.name] = load
-            print(f"Загрузка преподавателя {teacher.name}: {load}%")
-
-        return teacher_load
-
-    def finish_all_teachers_work(self):
-        # Завершаем работу всех преподавателей
-        for teacher in self.teachers:
-            # Если преподаватель работает на курсе, завершаем его работу
-            for course in self.courses:
-                if course.teacher == teacher:
-                    course.remove_teacher(self)
-
-            # Добавляем все текущие активные интервалы в merged_intervals
-            current_time = time.time()
-            for course, start_time in teacher.start_work_on_courses.items():
-                if course not in teacher.end_work_on_courses:
-                    teacher.time_intervals.append((start_time, current_time))
-                    print(
-                        f"Добавлен текущий активный интервал для преподавателя {teacher.name} на курс {course}: ({start_time}, {current_time})")
+    def calculate_teacher_idle_time(self):
+        current_time = self.simulation.clock.now()
+        total_time_school = current_time - self.start_time
+        return {teacher.name: teacher.idle_time(current_time, total_time_school) for teacher in self.teachers}
 
 class Teacher:
     def __init__(self, name, subject, assignment_time=None):
         self.name = name
         self.subject = subject
         self.assignment_count = 0
+        self.simulation = None
+        # Начало работы на текущих курсах; занятость копится одним счётчиком: пока ведётся хотя бы
+        # один курс, время с busy_since считается рабочим, пересекающиеся курсы не учитываются дважды
         self.start_work_on_courses = {}
-        self.end_work_on_courses = {}
-        self.time_intervals = []
-
-    def merge_intervals(self, intervals):
-        if not intervals:
-            print("Список интервалов пуст.")
-            return []
-
-        # Проверяем, есть ли текущий активный интервал для курсов без окончания
-        current_time = time.time()
-        for course, start_time in self.start_work_on_courses.items():
-            # Проверяем, если курс в процессе работы (нет времени окончания)
-            if course not in self.end_work_on_courses:
-                intervals.append((start_time, current_time))
-                print(f"Добавлен текущий активный интервал: ({start_time}, {current_time}) для курса {course}")
-
-        print(f"Исходные интервалы: {intervals}")
-        # Сортируем интервалы по времени начала
-        intervals.sort(key=lambda x: x[0])
-        print(f"Отсортированные интервалы: {intervals}")
-
-        merged = [intervals[0]]
-        print(f"Инициализация: первый интервал {merged[0]} добавлен в список объединённых.")
-
-        for i, current in enumerate(intervals[1:], start=1):
-            last = merged[-1]
-            print(f"\nОбрабатываемый интервал {i}: {current}")
-            print(f"Последний объединённый интервал: {last}")
-
-            if current[0] <= last[1]:
-                # Интервалы пересекаются, объединяем
-                merged[-1] = (last[0], max(last[1], current[1]))
-                print(f"Объединение: новый интервал {merged[-1]}")
-            else:
-                # Нет пересечения, добавляем как новый
-                merged.append(current)
-                print(f"Добавление: интервал {current} добавлен как новый.")
+        self.busy_time = 0.0
+        self.busy_since = None
+
+    def start_course(self, course_title, current_time):
+        if not self.start_work_on_courses:
+            self.busy_since = current_time
+        self.start_work_on_courses[course_title] = current_time
+
+    def finish_course(self, course_title, current_time):
+        start_time = self.start_work_on_courses.pop(course_title, None)
+        if start_time is None:
+            return 0.0
+        if not self.start_work_on_courses:
+            self.busy_time += current_time - self.busy_since
+            self.busy_since = None
+        return current_time - start_time
+
+    def is_busy(self):
+        return bool(self.start_work_on_courses)
+
+    def busy_course_count(self):
+        return len(self.start_work_on_courses)
+
+    def total_busy_time(self, current_time):
+        if self.busy_since is None:
+            return self.busy_time
+        return self.busy_time + current_time - self.busy_since
+
+    def idle_time(self, current_time, total_time):
+        # Разность накопленных сумм может уйти в минус на ошибку округления
+        return max(0.0, total_time - self.total_busy_time(current_time))
+
+    def load(self, current_time, total_time):
+        return self.total_busy_time(current_time) / total_time * 100 if total_time > 0 else 0
+
+MonitorSnapshot = namedtuple("MonitorSnapshot", ("version", "values"))
+
+class MonitorPublisher:
+    # Один цикл after на все окна мониторинга: раз за такт владелец модели снимает только
+    # метрики, нужные открытым окнам, а окно перерисовывается, если версии его метрик изменились
+    def __init__(self, root, school, interval=1000):
+        self.root = root
+        self.school = school
+        self.simulation = school.simulation
+        self.interval = interval
+        self.views = []
+        self.values = {}
+        self.versions = {}
+        self.version = 0
+        self.root.after(self.interval, self.tick)
+
+    def subscribe(self, view):
+        view.rendered_version = None
+        self.views.append(view)
+        self.publish([view], self.simulation.commands.call(self.simulation.snapshots.take, self.school, view.metrics))
+
+    def tick(self):
+        self.views = [view for view in self.views if view.exists()]
+        if self.views:
+            required = set()
+            for view in self.views:
+                required.update(view.metrics)
+            # Снимок, заказанный на прошлом такте, уже готов; новый строится без ожидания
+            snapshot = self.simulation.snapshots.latest
+            self.simulation.commands.submit(self.simulation.snapshots.publish, self.school, frozenset(required))
+            if required.issubset(snapshot):
+                self.publish(self.views, snapshot)
+        self.root.after(self.interval, self.tick)
+
+    def publish(self, views, snapshot_values):
+        required = set()
+        for view in views:
+            required.update(view.metrics)
+
+        for metric in required:
+            value = snapshot_values[metric]
+            if metric not in self.values or self.values[metric] != value:
+                self.values[metric] = value
+                self.versions[metric] = self.versions.get(metric, 0) + 1
+                self.version += 1
+
+        snapshot = MonitorSnapshot(self.version, dict(self.values))
+        for view in views:
+            view_version = tuple(self.versions[metric] for metric in view.metrics)
+            if view_version != view.rendered_version:
+                view.rendered_version = view_version
+                view.render(snapshot)
+
+class MonitorWindow:
+    def __init__(self, app, title, metrics, render_text, geometry=None):
+        self.metrics = metrics
+        self.render_text = render_text
+        self.rendered_version = None
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title(title)
+        if geometry:
+            self.window.geometry(geometry)
+
+        self.label = tk.Label(self.window, text="", justify=tk.LEFT)
+        self.label.pack(pady=10, padx=10)
+
+    def exists(self):
+        return bool(self.window.winfo_exists())
+
+    def render(self, snapshot):
+        self.label.config(text=self.render_text(snapshot.values))
+
+class LogViewer:
+    # Окно журнала дописывает только новые записи начиная с курсора (номера последней записи)
+    metrics = ("log_sequence",)
+
+    def __init__(self, app, max_lines=1000):
+        self.app = app
+        self.logger = app.school.simulation.logger
+        self.max_lines = max_lines
+        self.cursor = 0
+        self.rendered_version = None
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Action Log")
+        self.window.geometry("1200x600")
+
+        filter_frame = tk.Frame(self.window)
+        filter_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+
+        self.source_filter = tk.StringVar(value="")
+        self.search_text = tk.StringVar(value="")
+        tk.Label(filter_frame, text="Source:").pack(side=tk.LEFT)
+        tk.Entry(filter_frame, textvariable=self.source_filter, width=20).pack(side=tk.LEFT, padx=5)
+        tk.Label(filter_frame, text="Search:").pack(side=tk.LEFT)
+        tk.Entry(filter_frame, textvariable=self.search_text, width=40).pack(side=tk.LEFT, padx=5)
+        tk.Button(filter_frame, text="Apply", command=self.rebuild).pack(side=tk.LEFT, padx=5)
+
+        tk.Label(self.window, text=ActionLogger.HEADER, justify=tk.LEFT, anchor=tk.W, font=("Courier", 10)).pack(
+            fill=tk.X, padx=10
+        )
 
-        print(f"\nИтоговые объединённые интервалы: {merged}")
-        return merged
+        self.text_box = tk.Text(self.window, wrap=tk.NONE, width=100, height=30, font=("Courier", 10))
+        self.text_box.pack(padx=10, pady=10, expand=True, fill=tk.BOTH)
+        self.text_box.config(state=tk.DISABLED)
+
+        scrollbar = tk.Scrollbar(self.window, command=self.text_box.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text_box.config(yscrollcommand=scrollbar.set)
+
+    def exists(self):
+        return bool(self.window.winfo_exists())
+
+    def matches(self, entry):
+        source = self.source_filter.get().strip()
+        if source and entry.source != source:
+            return False
+        search = self.search_text.get().strip().lower()
+        if search and search not in entry.action.lower() and search not in self.logger.format_details(entry).lower():
+            return False
+        return True
+
+    def append(self, entries):
+        lines = [self.logger.format_entry(entry) for entry in entries if self.matches(entry)]
+        if not lines:
+            return
+
+        self.text_box.config(state=tk.NORMAL)
+        self.text_box.insert(tk.END, "\n".join(lines) + "\n")
+        line_count = int(self.text_box.index("end-1c").split(".")[0]) - 1
+        if line_count > self.max_lines:
+            self.text_box.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+        self.text_box.config(state=tk.DISABLED)
+        self.text_box.see(tk.END)
+
+    def rebuild(self):
+        self.text_box.config(state=tk.NORMAL)
+        self.text_box.delete("1.0", tk.END)
+        self.text_box.config(state=tk.DISABLED)
+        self.cursor = 0
+        self.update()
+
+    def update(self):
+        entries = self.logger.entries_since(self.cursor)
+        if entries:
+            self.cursor = entries[-1].sequence
+            self.append(entries[-self.max_lines:])
+
+    def render(self, snapshot):
+        # Скрытое или свёрнутое окно не перерисовывается; курсор не двигается,
+        # поэтому после открытия окна допишутся пропущенные записи
+        if self.window.winfo_viewable():
+            self.update()
+        else:
+            self.rendered_version = None
+
+class EnrollmentChart:
+    # Столбцы и линии создаются один раз; при изменении данных перерисовываются только они
+    # поверх сохранённого фона (blitting), без изменений кадр пропускается
+    HISTORY_SIZE = 600
+    metrics = ("time", "courses", "queue_length", "system_utilization")
+
+    def __init__(self, app):
+        self.app = app
+        self.school = app.school
+        self.rendered_version = None
+        self.mode = "bars"
+        self.background = None
+        self.last_counts = None
+        self.history = deque(maxlen=self.HISTORY_SIZE)
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title("Динамическая диаграмма")
+
+        self.fig, self.bar_ax = plt.subplots(figsize=(6, 4))
+        course_titles = [course.title for course in self.school.courses]
+        self.bars = self.bar_ax.bar(course_titles, [0] * len(course_titles), color='purple', animated=True)
+        self.bar_ax.set_ylim(0, max((course.capacity for course in self.school.courses), default=0) + 1)
+        self.bar_ax.set_title("Количество студентов на курсах")
+        self.bar_ax.set_xlabel("Курсы")
+        self.bar_ax.set_ylabel("Количество студентов")
+
+        self.history_ax = self.fig.add_subplot(111, label="history")
+        self.utilization_ax = self.history_ax.twinx()
+        (self.queue_line,) = self.history_ax.plot([], [], color='purple', animated=True, label="Очередь")
+        (self.utilization_line,) = self.utilization_ax.plot([], [], color='orange', animated=True, label="Загрузка")
+        self.history_ax.set_title("Длина очереди и загрузка системы")
+        self.history_ax.set_xlabel("Модельное время, с")
+        self.history_ax.set_ylabel("Заявок в очереди")
+        self.history_ax.set_ylim(0, self.school.simulation.queue.max_size + 1)
+        self.history_ax.set_xlim(0, 60)
+        self.utilization_ax.set_ylabel("Загрузка, %")
+        self.utilization_ax.set_ylim(0, 105)
+        self.set_history_visible(False)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.window)
+        self.canvas.get_tk_widget().pack()
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+        tk.Button(self.window, text="Bars / History", command=self.toggle_mode).pack(pady=5)
+
+        self.canvas.draw()
+
+    def exists(self):
+        return bool(self.window.winfo_exists())
+
+    def set_history_visible(self, visible):
+        self.bar_ax.set_visible(not visible)
+        self.history_ax.set_visible(visible)
+        self.utilization_ax.set_visible(visible)
+
+    def animated_artists(self):
+        if self.mode == "bars":
+            return list(self.bars)
+        return [self.queue_line, self.utilization_line]
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.animated_artists():
+            self.fig.draw_artist(artist)
+
+    def blit(self):
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        for artist in self.animated_artists():
+            self.fig.draw_artist(artist)
+        self.canvas.blit(self.fig.bbox)
+
+    def toggle_mode(self):
+        self.mode = "history" if self.mode == "bars" else "bars"
+        self.set_history_visible(self.mode == "history")
+        self.last_counts = None
+        self.rendered_version = None
+        self.update_history_lines()
+        self.canvas.draw()
+
+    def sample_history(self, values):
+        now = values["time"]
+        if self.history and self.history[-1][0] == now:
+            return False
+        self.history.append((now, values["queue_length"], values["system_utilization"]))
+        return True
+
+    def update_history_lines(self):
+        if not self.history:
+            return False
+        times, queue_lengths, utilizations = zip(*self.history)
+        self.queue_line.set_data(times, queue_lengths)
+        self.utilization_line.set_data(times, utilizations)
+
+        # Оси меняются редко (при выходе за правую границу), тогда нужна полная перерисовка
+        left, right = self.history_ax.get_xlim()
+        if times[-1] > right or times[0] > left + (right - left) / 2:
+            self.history_ax.set_xlim(times[0], times[0] + max(2 * (times[-1] - times[0]), 60))
+            return True
+        return False
+
+    def render(self, snapshot):
+        history_changed = self.sample_history(snapshot.values)
+
+        if self.mode == "bars":
+            counts = tuple(len(students) for _, _, students in snapshot.values["courses"])
+            if counts == self.last_counts:
+                return
+            for bar, count, last_count in zip(self.bars, counts, self.last_counts or (None,) * len(counts)):
+                if count != last_count:
+                    bar.set_height(count)
+            self.last_counts = counts
+            self.blit()
+        elif history_changed:
+            if self.update_history_lines():
+                self.canvas.draw()
+            else:
+                self.blit()
 
 class ArtSchoolApp:
     paused = False
 
-    def __init__(self, root, school, students_pool):
+    def __init__(self, root, school, students_pool, log_view_lines=1000, monitor_interval=1000,
+                 checkpoint_path="artschool.ckpt"):
+        load_gui_modules()
         self.root = root
         self.school = school
+        self.simulation = school.simulation
         self.students_pool = students_pool
+        self.log_view_lines = log_view_lines
+        self.checkpoint_path = checkpoint_path
+        self.monitor = MonitorPublisher(root, school, interval=monitor_interval)
+        self.monitor_windows = {}
+        # Поток модели не обращается к tkinter: предел заявок передаётся ему командой при изменении поля
+        self.limit = ApplicationLimit(0)
+        self.finished = Event()
         self.application_limit = tk.IntVar(value=0)
+        self.application_limit.trace_add("write", self.update_application_limit)
+        self.root.after(monitor_interval, self.check_finished)
 
         self.root.title("Art School Enrollment System")
         self.root.geometry("600x400")
@@ -519,162 +2201,111 @@ class ArtSchoolApp:
                                                                                                              pady=10)
 
         tk.Button(button_frame, text="Pause/Resume", command=self.toggle_pause).grid(row=7, column=0, pady=10)
+        tk.Button(button_frame, text="Save Checkpoint", command=self.save_checkpoint).grid(row=8, column=0, pady=10)
+
+    def update_application_limit(self, *args):
+        try:
+            value = self.application_limit.get()
+        except tk.TclError:
+            # Поле ещё редактируется и не содержит числа
+            return
+        self.simulation.commands.submit(self.limit.set, value)
+
+    def check_finished(self):
+        if self.finished.is_set():
+            self.paused = True
+            self.show_summary_table()
+        else:
+            self.root.after(self.monitor.interval, self.check_finished)
 
     def toggle_pause(self):
         self.paused = not self.paused
         status = "paused" if self.paused else "running"
-        ActionLogger.add_entry(
-            source="App",
-            action="Pause/Resume",
-            details=f"Application is now {status}"
+        self.simulation.commands.submit(
+            self.simulation.logger.add_entry, "App", "Pause/Resume", "Application is now {}", (status,)
         )
         messagebox.showinfo("Pause/Resume", f"Application is now {status}.")
 
+    def save_checkpoint(self):
+        if self.simulation.application_limit is None:
+            messagebox.showinfo("Save Checkpoint", "Simulation has not started yet.")
+            return
+        # Состояние снимает поток модели; сжатие и запись файла идут в фоне
+        self.simulation.commands.call(save_checkpoint, self.school, self.students_pool, self.checkpoint_path)
+        messagebox.showinfo("Save Checkpoint", f"Checkpoint is being saved to {self.checkpoint_path}.")
+
     def check_queue(self):
+        queue = self.simulation.commands.call(self.simulation.snapshots.take, self.school, ("queue",))["queue"]
         queue_status = "\n".join(
-            f"{app.student.name} на курс {app.course.title}" for app in ApplicationQueue.applications
+            f"{student_name} на курс {course_title}" for student_name, course_title in queue
         ) or "Очередь пуста"
         messagebox.showinfo("Queue Status", queue_status)
 
-    def show_students(self):
-        if hasattr(self, 'students_window') and self.students_window.winfo_exists():
-            self.update_students_window()
+    def open_monitor_window(self, name, create_view):
+        # Повторное нажатие кнопки поднимает открытое окно, а не запускает второй цикл обновления
+        view = self.monitor_windows.get(name)
+        if view and view.exists():
+            view.window.deiconify()
+            view.window.lift()
         else:
-            self.students_window = tk.Toplevel(self.root)
-            self.students_window.title("Enrolled Students")
-            self.students_window.geometry("600x200")
-
-            self.students_label = tk.Label(self.students_window, text="", justify=tk.LEFT)
-            self.students_label.pack(pady=10, padx=10)
+            view = self.monitor_windows[name] = create_view()
+            self.monitor.subscribe(view)
 
-            self.update_students_window()
+    def show_students(self):
+        self.open_monitor_window("students", lambda: MonitorWindow(
+            self, "Enrolled Students", ("courses",), self.format_students, geometry="600x200"
+        ))
 
-    def update_students_window(self):
+    @staticmethod
+    def format_students(values):
         course_status = ""
-        for course in self.school.courses:
-            enrolled_students = ", ".join(student.name for student in course.enrolled_students) or "Нет студентов"
-            course_status += f"{course.title} ({len(course.enrolled_students)}/{course.capacity} студентов): {enrolled_students}\n"
-
-        self.students_label.config(text=course_status)
-        self.students_window.after(1000, self.update_students_window)
+        for title, capacity, students in values["courses"]:
+            enrolled_students = ", ".join(students) or "Нет студентов"
+            course_status += f"{title} ({len(students)}/{capacity} студентов): {enrolled_students}\n"
+        return course_status
 
     def view_log(self):
-        log_window = tk.Toplevel(self.root)
-        log_window.title("Action Log")
-        log_window.geometry("1200x600")
-
-        text_box = tk.Text(log_window, wrap=tk.WORD, width=100, height=30)
-        text_box.pack(padx=10, pady=10, expand=True, fill=tk.BOTH)
-        text_box.config(state=tk.DISABLED)
-
-        scrollbar = tk.Scrollbar(log_window, command=text_box.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        text_box.config(yscrollcommand=scrollbar.set)
-
-        def update_log():
-            if self.paused:
-                log_window.after(1000, update_log)
-                return
-
-            log = ActionLogger.get_log()
-
-            text_box.config(state=tk.NORMAL)
-            text_box.delete(1.0, tk.END)
-            text_box.insert(tk.END, log)
-            text_box.config(state=tk.DISABLED)
-
-            text_box.see(tk.END)
-
-            log_window.after(1000, update_log)
-
-        update_log()
+        self.open_monitor_window("log", lambda: LogViewer(self, max_lines=self.log_view_lines))
 
     def show_dynamic_chart(self):
-        self.chart_window = tk.Toplevel(self.root)
-        self.chart_window.title("Динамическая диаграмма")
-
-        self.fig, self.ax = plt.subplots(figsize=(6, 4))
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.chart_window)
-        self.canvas.get_tk_widget().pack()
-
-        self.update_dynamic_chart()
-
-    def update_dynamic_chart(self):
-        course_titles = [course.title for course in self.school.courses]
-        student_counts = [len(course.enrolled_students) for course in self.school.courses]
-
-        self.ax.clear()
-
-        self.ax.bar(course_titles, student_counts, color='purple')
-        self.ax.set_title("Количество студентов на курсах")
-        self.ax.set_xlabel("Курсы")
-        self.ax.set_ylabel("Количество студентов")
-
-        self.canvas.draw()
-
-        self.chart_window.after(1000, self.update_dynamic_chart)
+        load_chart_modules()
+        self.open_monitor_window("chart", lambda: EnrollmentChart(self))
 
     def show_refusals(self):
-        if hasattr(self, 'refusals_window') and self.refusals_window.winfo_exists():
-            self.update_refusals_window()
-        else:
-            self.refusals_window = tk.Toplevel(self.root)
-            self.refusals_window.title("Refusals")
+        self.open_monitor_window("refusals", lambda: MonitorWindow(
+            self, "Refusals", ("refusals",), self.format_refusals
+        ))
 
-            self.refusals_label = tk.Label(self.refusals_window, text="", justify=tk.LEFT)
-            self.refusals_label.pack(pady=10, padx=10)
-
-            self.update_refusals_window()
-
-    def update_refusals_window(self):
-        total_applications, total_refusals, refusal_rate = ApplicationQueue.get_refusals()
-        stats_table = f"""
+    @staticmethod
+    def format_refusals(values):
+        total_applications, total_refusals, refusal_rate = values["refusals"]
+        return f"""
         Число заявок: {total_applications}
         Число отказов: {total_refusals}
         Процент отказов: {refusal_rate:.2f}%
         """
-        self.refusals_label.config(text=stats_table)
-        self.refusals_window.after(1000, self.update_refusals_window)
 
     def show_teacher_utilization(self):
-        if hasattr(self, 'utilization_window') and self.utilization_window.winfo_exists():
-            self.update_teacher_utilization_window()
-        else:
-            self.utilization_window = tk.Toplevel(self.root)
-            self.utilization_window.title("Teacher Utilization")
+        self.open_monitor_window("utilization", lambda: MonitorWindow(
+            self, "Teacher Utilization", ("teacher_utilization",), self.format_teacher_utilization
+        ))
 
-            self.utilization_label = tk.Label(self.utilization_window, text="", justify=tk.LEFT)
-            self.utilization_label.pack(pady=10, padx=10)
-
-            self.update_teacher_utilization_window()
-
-    def update_teacher_utilization_window(self):
-        utilization_data = self.school.get_teacher_utilization()
+    @staticmethod
+    def format_teacher_utilization(values):
         utilization_table = "Прибор         | Занятость | % Занятости\n" + "-" * 35 + "\n"
-        for teacher, (is_busy, utilization) in utilization_data.items():
+        for teacher_name, is_busy, utilization in values["teacher_utilization"]:
             status = "Занят" if is_busy else "Свободен"
-            utilization_table += f"{teacher.name:<14} | {status:<9} | {utilization:.2f}%\n"
-
-        self.utilization_label.config(text=utilization_table)
-        self.utilization_window.after(1000, self.update_teacher_utilization_window)
+            utilization_table += f"{teacher_name:<14} | {status:<9} | {utilization:.2f}%\n"
+        return utilization_table
 
     def show_summary_table(self):
         summary_window = tk.Toplevel(self.root)
         summary_window.title("Итоговая таблица")
         summary_window.geometry("600x400")
 
-        total_applications, total_refusals, refusal_rate = ApplicationQueue.get_refusals()
-        total_students = len(self.students_pool)
-
         summary_label = tk.Label(summary_window, text="Общие данные", font=("Arial", 14, "bold"))
         summary_label.pack(pady=10)
-        summary_text = f"""
-        Количество источников (студентов): {total_students}
-        Общее количество заявок: {total_applications}
-        Размер буфера: {ApplicationQueue.MAX_QUEUE_SIZE}
-        Число отказов: {total_refusals}
-        Вероятность отказа: {refusal_rate:.2f}%
-        """
+        summary_text = self.simulation.commands.call(format_summary_table, self.school, self.students_pool)
         summary_data_label = tk.Label(summary_window, text=summary_text, justify=tk.LEFT)
         summary_data_label.pack(pady=10)
 
@@ -698,12 +2329,7 @@ class ArtSchoolApp:
         student_summary_window.title("Таблица заявок студентов")
         student_summary_window.geometry("600x400")
 
-        student_summary = "Студент           | Кол-во заявок | Кол-во отказов | Вероятность отказа (%)\n"
-        student_summary += "-" * 65 + "\n"
-
-        for student in self.students_pool:
-            refusal_rate = student.get_refusal_probability()
-            student_summary += f"{student.name:<17} | {student.applications_sent:^13} | {student.refusals:^14} | {refusal_rate:>8.2f}%\n"
+        student_summary = self.simulation.commands.call(format_student_summary_table, self.students_pool)
 
         student_summary_label = tk.Label(
             student_summary_window, text=student_summary, justify=tk.LEFT, font=("Courier", 10)
@@ -711,140 +2337,1200 @@ class ArtSchoolApp:
         student_summary_label.pack(pady=10)
 
     def show_teacher_summary_table(self):
-        self.school.finish_all_teachers_work()
-
         teacher_summary_window = tk.Toplevel(self.root)
         teacher_summary_window.title("Коэффициент использования преподавателей")
         teacher_summary_window.geometry("600x400")
 
-        teacher_utilization_ratios = self.school.get_teacher_utilization_ratios()
-
-        teacher_load = self.school.calculate_teacher_load()
-
-        teacher_summary = "Преподаватель    | Коэффициент    | Загрузка (%)\n" + "-" * 50 + "\n"
-
-        for teacher_name in teacher_utilization_ratios:
-            ratio = teacher_utilization_ratios.get(teacher_name, 0)
-            load = teacher_load.get(teacher_name, 0)
-            teacher_summary += f"{teacher_name:<16} | {ratio:.4f}        | {load:.2f}%\n"
-
-        system_utilization = self.school.get_system_utilization()
-        system_utilization_text = f"\nЗагрузка системы: {system_utilization:.2f}%"
+        teacher_summary = self.simulation.commands.call(format_teacher_summary_table, self.school)
 
         teacher_summary_label = tk.Label(
-            teacher_summary_window, text=teacher_summary + system_utilization_text, justify=tk.LEFT,
+            teacher_summary_window, text=teacher_summary, justify=tk.LEFT,
             font=("Courier", 10)
         )
         teacher_summary_label.pack(pady=10)
 
     def show_time_statistics(self):
-        (
-            average_waiting_time,
-            average_processing_time,
-            variance_waiting_time,
-            variance_processing_time,
-        ) = ApplicationQueue.calculate_statistics()
-
-        average_system_time = average_waiting_time + average_processing_time
-
-        stats_message = f"""
-        Среднее время ожидания (Tож): {average_waiting_time:.2f} секунд
-        Среднее время обслуживания (Tобсл): {average_processing_time:.2f} секунд
-        Среднее время в системе (Твс): {average_system_time:2f} секунд
-        Дисперсия времени ожидания (Dож): {variance_waiting_time:.2f}
-        Дисперсия времени обслуживания (Dобсл): {variance_processing_time:.2f}
-        """
+        stats_message = self.simulation.commands.call(format_time_statistics, self.simulation)
         messagebox.showinfo("Временная статистика", stats_message)
 
-def generate_applications(school, app_instance, students_pool):
-    application_count = 0
-
-    while True:
-        if not app_instance.paused:
-            limit = app_instance.application_limit.get()
-
-            if limit > 0 and application_count >= limit:
-                app_instance.paused = True
-                ApplicationQueue.finalize_statistics()
-                app_instance.show_summary_table()
-                break
-
-            student = random.choice(students_pool)
-            course = random.choice(school.courses)
-
-            already_enrolled = student in course.enrolled_students
-            already_in_queue = any(app.student == student and app.course == course for app in ApplicationQueue.applications)
+def format_summary_table(school, students_pool):
+    total_applications, total_refusals, refusal_rate = school.simulation.queue.get_refusals()
+    total_students = len(students_pool)
 
-            if not already_enrolled and not already_in_queue:
-                application = student.apply(course)
-                application.submit()
-                application.start_waiting_process()
-                application_count += 1
-
-                if student in course.enrolled_students:
-                    application.complete_waiting_process()
-                    application.start_service_process()
-
-                    while application.service_start_time is None:
-                        sleep(0.1)
-
-        sleep(random.randint(2, 5))
-
-def manage_courses_and_teachers(school, app_instance):
-    start_time = time.time()
-    last_teacher_removal_time = 0
-    delay_before_removal = 15
-    lambda_removal = 1 / 30
+    return f"""
+        Количество источников (студентов): {total_students}
+        Общее количество заявок: {total_applications}
+        Размер буфера: {school.simulation.queue.max_size}
+        Дисциплина буфера: {school.simulation.queue.buffer_policy}
+        Число отказов: {total_refusals}
+        Вероятность отказа: {refusal_rate:.2f}%
+        """
 
-    while True:
-        if not app_instance.paused:
-            for course in school.courses:
-                if not course.teacher:
-                    school.assign_next_teacher(course)
+def format_student_summary_table(students_pool):
+    student_summary = "Студент           | Кол-во заявок | Кол-во отказов | Вероятность отказа (%)\n"
+    student_summary += "-" * 65 + "\n"
+
+    for student in students_pool:
+        refusal_rate = student.get_refusal_probability()
+        student_summary += f"{student.name:<17} | {student.applications_sent:^13} | {student.refusals:^14} | {refusal_rate:>8.2f}%\n"
+
+    return student_summary
+
+def collect_teacher_summary(school):
+    teacher_utilization_ratios = school.get_teacher_utilization_ratios()
+    teacher_load = school.calculate_teacher_load()
+    teacher_idle_time = school.calculate_teacher_idle_time()
+
+    return {
+        "teachers": {
+            teacher_name: {
+                "ratio": ratio,
+                "load": teacher_load.get(teacher_name, 0),
+                "idle_time": teacher_idle_time.get(teacher_name, 0),
+            }
+            for teacher_name, ratio in teacher_utilization_ratios.items()
+        },
+        "system_utilization": school.get_system_utilization(),
+    }
+
+def format_teacher_summary_table(school, teacher_summary=None):
+    teacher_summary = teacher_summary or collect_teacher_summary(school)
+
+    table = "Преподаватель    | Коэффициент    | Загрузка (%) | Простой (с)\n" + "-" * 64 + "\n"
+    for teacher_name, values in teacher_summary["teachers"].items():
+        table += (f"{teacher_name:<16} | {values['ratio']:.4f}        | {values['load']:>11.2f}% | "
+                  f"{values['idle_time']:>11.2f}\n")
+
+    table += f"\nЗагрузка системы: {teacher_summary['system_utilization']:.2f}%"
+    return table
+
+def collect_time_statistics(simulation):
+    (
+        average_waiting_time,
+        average_processing_time,
+        variance_waiting_time,
+        variance_processing_time,
+    ) = simulation.queue.calculate_statistics()
+    statistics = simulation.queue.time_statistics
+
+    return {
+        "average_waiting_time": average_waiting_time,
+        "average_processing_time": average_processing_time,
+        "average_system_time": statistics.system.mean,
+        "variance_waiting_time": variance_waiting_time,
+        "variance_processing_time": variance_processing_time,
+        "detailed": statistics.as_dict(),
+    }
+
+def format_time_statistics(simulation, time_statistics=None):
+    time_statistics = time_statistics or collect_time_statistics(simulation)
+
+    return f"""
+        Среднее время ожидания (Tож): {time_statistics['average_waiting_time']:.2f} секунд
+        Среднее время обслуживания (Tобсл): {time_statistics['average_processing_time']:.2f} секунд
+        Среднее время в системе (Твс): {time_statistics['average_system_time']:2f} секунд
+        Дисперсия времени ожидания (Dож): {time_statistics['variance_waiting_time']:.2f}
+        Дисперсия времени обслуживания (Dобсл): {time_statistics['variance_processing_time']:.2f}
+        {format_quantiles("Tож", time_statistics['detailed']['waiting'])}
+        {format_quantiles("Tобсл", time_statistics['detailed']['service'])}
+        {format_quantiles("Твс", time_statistics['detailed']['system'])}
+        """
 
-            current_time = time.time()
+def format_quantiles(label, statistics):
+    return (
+        f"{label}: мин {statistics['min']:.2f}, P50 {statistics['p50']:.2f}, "
+        f"P95 {statistics['p95']:.2f}, P99 {statistics['p99']:.2f}, макс {statistics['max']:.2f} секунд"
+    )
 
-            if current_time - start_time >= delay_before_removal:
-                removal_interval = random.expovariate(lambda_removal)
+def submit_application(student, course):
+    # Команда подачи заявки: внешние источники вызывают её через simulation.commands.submit
+    already_enrolled = course.is_enrolled(student)
+    already_in_queue = course.simulation.queue.is_waiting(student, course)
 
-                if current_time - last_teacher_removal_time >= removal_interval:
-                    courses_with_teachers = [course for course in school.courses if course.teacher]
-                    if courses_with_teachers:
-                        random.choice(courses_with_teachers).remove_teacher(school)
-                        last_teacher_removal_time = current_time
+    if not already_enrolled and not already_in_queue:
+        application = student.apply(course)
+        application.submit()
+        return application
+    return None
+
+def generate_applications(school, students_pool, application_limit):
+    simulation = school.simulation
+    limit = application_limit()
+    if limit > 0 and simulation.queue.total_applications >= limit:
+        if simulation.trace_recorder:
+            simulation.trace_recorder.record(simulation.clock.now(), TraceRecorder.END)
+        simulation.queue.finalize_statistics()
+        simulation.calendar.stop()
+        return
+
+    student = simulation.random.choose("student", students_pool)
+    course = simulation.random.choose("course", school.courses)
+    if simulation.trace_recorder:
+        simulation.trace_recorder.record(simulation.clock.now(), EventCalendar.ARRIVAL, student.name, course.title)
+
+    submit_application(student, course)
+
+    simulation.calendar.schedule(simulation.random.arrival_gap(), EventCalendar.ARRIVAL,
+                                 generate_applications, school, students_pool, application_limit)
+
+def manage_courses_and_teachers(school):
+    simulation = school.simulation
+    course_to_remove_from = simulation.random.choose("departure_course", school.courses)
+    student = course_to_remove_from.remove_random_student()
+    if simulation.trace_recorder:
+        simulation.trace_recorder.record(simulation.clock.now(), EventCalendar.SERVICE_COMPLETION,
+                                         student.name if student else None, course_to_remove_from.title)
+
+    simulation.calendar.schedule(0, EventCalendar.QUEUE_DRAIN, drain_queue, simulation)
+    simulation.calendar.schedule(SERVICE_INTERVAL, EventCalendar.SERVICE_COMPLETION, manage_courses_and_teachers, school)
+
+def remove_random_teacher(school):
+    simulation = school.simulation
+    courses_with_teachers = [course for course in school.courses if course.teacher]
+    course = simulation.random.choose("removed_teacher", courses_with_teachers) if courses_with_teachers else None
+    if course:
+        course.remove_teacher(school)
+    if simulation.trace_recorder:
+        simulation.trace_recorder.record(simulation.clock.now(), EventCalendar.TEACHER_REMOVAL, None,
+                                         course.title if course else None)
+
+    simulation.calendar.schedule(simulation.random.removal_interval(), EventCalendar.TEACHER_REMOVAL,
+                                 remove_random_teacher, school)
+
+def drain_queue(simulation):
+    simulation.queue.process_queue()
+
+def export_metrics(simulation):
+    simulation.metrics.export()
+    simulation.calendar.schedule(simulation.metrics.export_interval, EventCalendar.METRICS_EXPORT, export_metrics,
+                                 simulation)
+
+def start_simulation(school, students_pool, application_limit, trace=None):
+    # С трассой приходы заявок, отчисления и удаления преподавателей берутся из неё, а не из генераторов
+    simulation = school.simulation
+    simulation.calendar.reset()
+    school.start_time = simulation.clock.now()
+    simulation.application_limit = application_limit
+    school.assign_teachers()
+
+    if trace:
+        trace.bind(school, students_pool)
+        trace.schedule_pending(school, application_limit)
+    else:
+        simulation.calendar.schedule(0, EventCalendar.ARRIVAL, generate_applications, school, students_pool,
+                                     application_limit)
+        simulation.calendar.schedule(SERVICE_INTERVAL, EventCalendar.SERVICE_COMPLETION,
+                                     manage_courses_and_teachers, school)
+        simulation.calendar.schedule(DELAY_BEFORE_REMOVAL + simulation.random.removal_interval(),
+                                     EventCalendar.TEACHER_REMOVAL, remove_random_teacher, school)
+    if simulation.metrics.export_path and simulation.metrics.export_interval > 0:
+        simulation.calendar.schedule(simulation.metrics.export_interval, EventCalendar.METRICS_EXPORT,
+                                     export_metrics, simulation)
+
+def run_simulation(school, app_instance, students_pool):
+    # Поток модели - единственный владелец состояния; после остановки календаря
+    # он продолжает выполнять команды интерфейса
+    simulation = school.simulation
+    simulation.commands.take_ownership()
+    start_simulation(school, students_pool, app_instance.limit)
+    simulation.calendar.run(time_scale=1.0, is_paused=lambda: app_instance.paused)
+
+    if simulation.calendar.stopped:
+        # Итоговую таблицу покажет поток интерфейса, увидев флаг завершения
+        app_instance.finished.set()
+
+    simulation.commands.serve_forever()
+
+class ApplicationLimit:
+    # Предел числа заявок - объект, а не lambda, чтобы календарь можно было сохранить в контрольной точке
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+class CheckpointWriter(Thread):
+    # Сжатие и запись идут в фоне; модель стоит только на время сериализации состояния
+    MAGIC = b"ARTSCHKP"
+    VERSION = 1
+    HEADER = struct.Struct("<8sHdQI")
+
+    def __init__(self, path, payload, model_time):
+        super().__init__(name="CheckpointWriter")
+        self.path = path
+        self.payload = payload
+        self.model_time = model_time
+
+    def run(self):
+        compressed = zlib.compress(self.payload, 1)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "wb") as output:
+            output.write(self.HEADER.pack(
+                self.MAGIC, self.VERSION, self.model_time, len(compressed), zlib.crc32(compressed)
+            ))
+            output.write(compressed)
+        os.replace(temporary_path, self.path)
+
+def capture_checkpoint(school, students_pool):
+    # Выполняется владельцем модели между событиями календаря
+    # Предел заявок всегда ApplicationLimit, в том числе в интерфейсе, поэтому tkinter не затрагивается
+    payload = pickle.dumps((school, students_pool), protocol=pickle.HIGHEST_PROTOCOL)
+    return payload, school.simulation.clock.now()
+
+def save_checkpoint(school, students_pool, path):
+    writer = CheckpointWriter(path, *capture_checkpoint(school, students_pool))
+    writer.start()
+    return writer
+
+def load_checkpoint(path):
+    with open(path, "rb") as checkpoint_file:
+        header = checkpoint_file.read(CheckpointWriter.HEADER.size)
+        if len(header) < CheckpointWriter.HEADER.size:
+            raise ValueError(f"Файл {path} не является контрольной точкой модели")
+        magic, version, _, length, checksum = CheckpointWriter.HEADER.unpack(header)
+        if magic != CheckpointWriter.MAGIC:
+            raise ValueError(f"Файл {path} не является контрольной точкой модели")
+        if version != CheckpointWriter.VERSION:
+            raise ValueError(f"Версия контрольной точки {version} не поддерживается")
+        compressed = checkpoint_file.read(length)
+    if len(compressed) != length or zlib.crc32(compressed) != checksum:
+        raise ValueError(f"Контрольная точка {path} повреждена")
+    return pickle.loads(zlib.decompress(compressed))
+
+def resume_simulation(path, overrides):
+    # Несколько экспериментов можно начать из одной точки: новый предел заявок, размер буфера
+    # и зерно (чтобы продолжения расходились) задаются поверх сохранённого состояния
+    school, students_pool = load_checkpoint(path)
+    simulation = school.simulation
+    if overrides.get("applications") is not None:
+        simulation.application_limit.value = overrides["applications"]
+    if overrides.get("buffer_size") is not None:
+        simulation.queue.max_size = overrides["buffer_size"]
+    if overrides.get("seed") is not None:
+        simulation.seed = overrides["seed"]
+        simulation.random = create_random_streams(
+            overrides["seed"], simulation.arrival_interval, simulation.lambda_removal,
+            "numpy" if isinstance(simulation.random, NumpyRandomStreams) else "python",
+        )
 
-            course_to_remove_from = random.choice(school.courses)
-            course_to_remove_from.remove_random_student()
+    if not any(event[2] == EventCalendar.ARRIVAL for event in simulation.calendar.events):
+        # Точка сохранена после остановки модели: поток заявок возобновляется, только если предел поднят
+        limit = simulation.application_limit()
+        if limit <= 0 or limit <= simulation.queue.total_applications:
+            raise ValueError("Модель в контрольной точке уже остановлена; задайте большее число заявок (--applications)")
+        simulation.calendar.schedule(0, EventCalendar.ARRIVAL, generate_applications, school, students_pool,
+                                     simulation.application_limit)
+    return school, students_pool
+
+class TraceRecorder:
+    # Трасса - заголовок, записи фиксированной длины (время, студент, курс, тип события) и в конце
+    # таблица имён студентов и курсов; число записей и смещение таблицы дописываются при закрытии
+    MAGIC = b"ARTSTRCE"
+    VERSION = 1
+    HEADER = struct.Struct("<8sHQQ")
+    RECORD = struct.Struct("<dIIB")
+    NONE = 0xFFFFFFFF
+    END = "end"
+    EVENT_CODES = {
+        EventCalendar.ARRIVAL: 1,
+        EventCalendar.SERVICE_COMPLETION: 2,
+        EventCalendar.TEACHER_REMOVAL: 3,
+        END: 4,
+    }
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0, 0))
+        self.record_count = 0
+        self.students = {}
+        self.courses = {}
+
+    def name_index(self, names, name):
+        if name is None:
+            return self.NONE
+        index = names.get(name)
+        if index is None:
+            index = names[name] = len(names)
+        return index
+
+    def record(self, event_time, event_type, student=None, course=None):
+        self.file.write(self.RECORD.pack(
+            event_time, self.name_index(self.students, student), self.name_index(self.courses, course),
+            self.EVENT_CODES[event_type],
+        ))
+        self.record_count += 1
+
+    def close(self):
+        names_offset = self.file.tell()
+        names = {"students": list(self.students), "courses": list(self.courses)}
+        self.file.write(json.dumps(names, ensure_ascii=False).encode("utf-8"))
+        self.file.seek(0)
+        self.file.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.record_count, names_offset))
+        self.file.close()
+
+class TraceReplayer:
+    # Трасса отображается в память и читается по записям; в календаре находятся только события
+    # ближайшего момента времени, поэтому размер трассы не влияет на размер кучи
+    EVENT_TYPES = {code: event_type for event_type, code in TraceRecorder.EVENT_CODES.items()}
+
+    def __init__(self, path):
+        self.path = path
+        self.position = 0
+        self.in_flight = 0
+        self.students = []
+        self.courses = []
+        self.open()
+
+    def open(self):
+        with open(self.path, "rb") as trace_file:
+            self.map = mmap.mmap(trace_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < TraceRecorder.HEADER.size:
+            raise ValueError(f"Файл {self.path} не является трассой событий")
+        magic, version, self.record_count, self.names_offset = TraceRecorder.HEADER.unpack_from(self.map)
+        if magic != TraceRecorder.MAGIC:
+            raise ValueError(f"Файл {self.path} не является трассой событий")
+        if version != TraceRecorder.VERSION:
+            raise ValueError(f"Версия трассы {version} не поддерживается")
+
+    # Отображение файла не сохраняется в контрольной точке: при восстановлении файл открывается заново
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["map"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.open()
+
+    def bind(self, school, students_pool):
+        # Студенты из трассы, которых нет в пуле (например, из импортированного журнала), добавляются в пул
+        names = json.loads(self.map[self.names_offset:].decode("utf-8"))
+        courses = {course.title: course for course in school.courses}
+        missing = [title for title in names["courses"] if title not in courses]
+        if missing:
+            raise ValueError(f"Курсы из трассы отсутствуют в школе: {', '.join(missing)}")
+        self.courses = [courses[title] for title in names["courses"]]
+
+        # id новых студентов продолжают наибольший id пула: буферы упорядочивают заявки по student.id
+        students = {student.name: student for student in students_pool}
+        next_id = max((student.id for student in students_pool), default=0) + 1
+        for name in names["students"]:
+            if name not in students:
+                students[name] = Student(name, next_id)
+                students_pool.append(students[name])
+                next_id += 1
+        self.students = [students[name] for name in names["students"]]
+
+    def lookup(self, objects, index):
+        return None if index == TraceRecorder.NONE else objects[index]
+
+    def schedule_pending(self, school, application_limit):
+        calendar = school.simulation.calendar
+        group_time = None
+        while self.position < self.record_count:
+            event_time, student, course, code = TraceRecorder.RECORD.unpack_from(
+                self.map, TraceRecorder.HEADER.size + self.position * TraceRecorder.RECORD.size
+            )
+            if group_time is not None and event_time != group_time:
+                break
+            group_time = event_time
+            calendar.schedule_at(event_time, self.EVENT_TYPES[code], self.replay, school, application_limit, code,
+                                 self.lookup(self.students, student), self.lookup(self.courses, course))
+            self.in_flight += 1
+            self.position += 1
+
+    def finish(self, simulation):
+        simulation.queue.finalize_statistics()
+        simulation.calendar.stop()
+
+    def replay(self, school, application_limit, code, student, course):
+        simulation = school.simulation
+        self.in_flight -= 1
+        if not self.in_flight:
+            # Следующая группа ставится в календарь раньше событий, которые породит текущая запись,
+            # как и при живом прогоне, где приход заявки запланирован заранее
+            self.schedule_pending(school, application_limit)
+
+        event_type = self.EVENT_TYPES[code]
+        if event_type == EventCalendar.ARRIVAL:
+            limit = application_limit()
+            if limit > 0 and simulation.queue.total_applications >= limit:
+                self.finish(simulation)
+                return
+            submit_application(student, course)
+        elif event_type == EventCalendar.SERVICE_COMPLETION:
+            # Если записанный студент при других параметрах модели не учится на курсе, уходит случайный
+            if student is not None and course.is_enrolled(student):
+                course.remove_student(student)
+            else:
+                course.remove_random_student()
+            simulation.calendar.schedule(0, EventCalendar.QUEUE_DRAIN, drain_queue, simulation)
+        elif event_type == EventCalendar.TEACHER_REMOVAL:
+            if course is None or course.teacher is None:
+                courses_with_teachers = [course for course in school.courses if course.teacher]
+                course = (simulation.random.choose("removed_teacher", courses_with_teachers)
+                          if courses_with_teachers else None)
+            if course:
+                course.remove_teacher(school)
+        else:
+            self.finish(simulation)
+            return
+
+        if not self.in_flight:
+            self.finish(simulation)
+
+TRACE_EVENT_NAMES = {
+    "arrival": EventCalendar.ARRIVAL,
+    "departure": EventCalendar.SERVICE_COMPLETION,
+    "teacher_removal": EventCalendar.TEACHER_REMOVAL,
+}
+
+def parse_trace_time(value):
+    try:
+        return float(value), False
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp(), True
+
+def import_trace(source, path):
+    # Журнал записи - CSV со столбцами time, student, course и необязательным event
+    # (arrival, departure, teacher_removal). Время - секунды модели или дата ISO 8601;
+    # даты отсчитываются от первого события журнала
+    rows = []
+    with open(source, newline="", encoding="utf-8") as source_file:
+        for line_number, row in enumerate(csv.DictReader(source_file), start=2):
+            event = (row.get("event") or "arrival").strip()
+            if event not in TRACE_EVENT_NAMES:
+                raise ValueError(f"{source}:{line_number}: неизвестный тип события '{event}'")
+            try:
+                event_time, is_date = parse_trace_time(row["time"].strip())
+            except (KeyError, AttributeError, ValueError):
+                raise ValueError(f"{source}:{line_number}: не удалось разобрать время '{row.get('time')}'")
+            student = (row.get("student") or "").strip() or None
+            course = (row.get("course") or "").strip() or None
+            # У прихода нужны студент и курс, у отчисления - курс (без студента уходит случайный)
+            if course is None and event != "teacher_removal":
+                raise ValueError(f"{source}:{line_number}: у события '{event}' не указан курс")
+            if student is None and event == "arrival":
+                raise ValueError(f"{source}:{line_number}: у события '{event}' не указан студент")
+            rows.append((event_time, is_date, TRACE_EVENT_NAMES[event], student, course))
+
+    rows.sort(key=lambda row: row[0])
+    origin = min((row[0] for row in rows if row[1]), default=0.0)
+    recorder = TraceRecorder(path)
+    for event_time, is_date, event_type, student, course in rows:
+        recorder.record(event_time - origin if is_date else event_time, event_type, student, course)
+    recorder.close()
+    return recorder.record_count
+
+DEFAULT_CONFIG = {
+    "courses": [
+        {"title": "Painting", "capacity": 2},
+        {"title": "Design", "capacity": 3},
+        {"title": "Graphics", "capacity": 3},
+        {"title": "Art", "capacity": 2},
+    ],
+    "teachers": [
+        {"name": "Alice", "subject": "Painting"},
+        {"name": "Bob", "subject": "Design"},
+        {"name": "Cony", "subject": "Art"},
+    ],
+    "students": 10,
+    "buffer_size": 10,
+    "buffer_policy": "default",
+    "applications": 0,
+    "seed": None,
+    "statistics_breakdown": False,
+    "records_retention": 100000,
+    "records_spill": None,
+    "log_size": ActionLogger.MAX_ENTRIES,
+    "log_level": "info",
+    "muted_sources": [],
+    "log_file": None,
+    "log_format": "jsonl",
+    "metrics": False,
+    "metrics_file": None,
+    "metrics_format": "prometheus",
+    "metrics_interval": 0,
+    "profile_events": False,
+    "log_view_lines": 1000,
+    "monitor_interval": 1000,
+    "arrival_interval": list(ARRIVAL_INTERVAL),
+    "lambda_removal": LAMBDA_REMOVAL,
+    "random_backend": "auto",
+    "teacher_policy": "round_robin",
+    "teacher_capacity": 1,
+    "replications": 0,
+    "workers": None,
+    "checkpoint": None,
+    "checkpoint_at": None,
+    "record_trace": None,
+    "replay_trace": None,
+}
+
+def build_simulation(config):
+    return Simulation(
+        seed=config.get("seed"),
+        max_queue_size=config["buffer_size"],
+        log_size=config["log_size"],
+        time_statistics=TimeStatistics(
+            track_courses=config.get("statistics_breakdown", False),
+            track_students=config.get("statistics_breakdown", False),
+        ),
+        arrival_interval=config.get("arrival_interval", ARRIVAL_INTERVAL),
+        lambda_removal=config.get("lambda_removal", LAMBDA_REMOVAL),
+        random_backend=config.get("random_backend", "auto"),
+        buffer_policy=config.get("buffer_policy", "default"),
+        metrics=Metrics(
+            enabled=config.get("metrics", False),
+            export_path=config.get("metrics_file"),
+            export_format=config.get("metrics_format", "prometheus"),
+            export_interval=config.get("metrics_interval", 0),
+            profile_events=config.get("profile_events", False),
+        ),
+        records=ApplicationRecords(
+            retention=config.get("records_retention"),
+            spill_path=config.get("records_spill"),
+        ),
+    )
+
+def build_school(config, simulation=None):
+    school = School(
+        config.get("name", "Art School"),
+        simulation or build_simulation(config),
+        teacher_policy=config.get("teacher_policy", "round_robin"),
+        teacher_capacity=config.get("teacher_capacity", 1),
+    )
+    for course in config["courses"]:
+        school.add_course(Course(course["title"], capacity=course["capacity"]))
+    for teacher in config["teachers"]:
+        school.add_teacher(Teacher(teacher["name"], teacher["subject"]))
+
+    students_pool = [Student(f"Student_{i}", i) for i in range(1, config["students"] + 1)]
+
+    return school, students_pool
+
+def configure_logging(simulation, config):
+    simulation.logger.configure(
+        max_entries=config["log_size"],
+        min_level=getattr(ActionLogger, config["log_level"].upper()),
+        muted_sources=config["muted_sources"],
+    )
+    if config.get("log_file"):
+        simulation.logger.attach_sink(ActionLogSink(config["log_file"], config["log_format"]))
+
+def parse_pair(value, first_key, second_key, second_type=str):
+    first, separator, second = value.partition(":")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"ожидается формат {first_key}:{second_key}, получено '{value}'")
+    return {first_key: first, second_key: second_type(second)}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Модель записи студентов в художественную школу")
+    parser.add_argument("--headless", action="store_true",
+                        help="запустить модель без графического интерфейса и вывести итоговые таблицы")
+    parser.add_argument("--config", help="JSON-файл с конфигурацией школы")
+    parser.add_argument("--applications", type=int, help="число заявок, после которого модель останавливается")
+    parser.add_argument("--students", type=int, help="число студентов (источников)")
+    parser.add_argument("--buffer-size", type=int, help="размер буфера заявок")
+    parser.add_argument("--buffer-policy", choices=list(BUFFER_POLICIES),
+                        help="дисциплина буфера: постановка, отказ и выбор заявок")
+    parser.add_argument("--course", action="append", metavar="TITLE:CAPACITY",
+                        type=lambda value: parse_pair(value, "title", "capacity", int),
+                        help="курс и его вместимость (можно указать несколько раз)")
+    parser.add_argument("--teacher", action="append", metavar="NAME:SUBJECT",
+                        type=lambda value: parse_pair(value, "name", "subject"),
+                        help="преподаватель и его предмет (можно указать несколько раз)")
+    parser.add_argument("--teacher-policy", choices=TeacherScheduler.POLICIES,
+                        help="политика назначения преподавателей на курсы")
+    parser.add_argument("--teacher-capacity", type=int,
+                        help="сколько курсов преподаватель ведёт одновременно (0 - без ограничения)")
+    parser.add_argument("--seed", type=int, help="начальное значение генератора случайных чисел")
+    parser.add_argument("--random-backend", choices=RANDOM_BACKENDS,
+                        help="генератор случайных чисел: блоки NumPy или random.Random (auto - NumPy, если установлен)")
+    parser.add_argument("--output", help="записать итоговые данные в JSON-файл")
+    parser.add_argument("--log-size", type=int, help="число последних записей журнала, хранимых в памяти")
+    parser.add_argument("--log-level", choices=["debug", "info", "warning"], help="минимальный уровень записей журнала")
+    parser.add_argument("--mute-source", action="append", dest="muted_sources", metavar="SOURCE",
+                        help="не записывать события этого источника (можно указать несколько раз)")
+    parser.add_argument("--log-file", help="писать полный журнал в файл в фоновом потоке")
+    parser.add_argument("--log-format", choices=["jsonl", "binary"], help="формат файла журнала")
+    parser.add_argument("--metrics", action="store_true", default=None,
+                        help="собирать счётчики и гистограммы модели (попадают в итоговый JSON)")
+    parser.add_argument("--metrics-file", help="записывать метрики в файл (включает сбор метрик)")
+    parser.add_argument("--metrics-format", choices=Metrics.FORMATS, help="формат файла метрик")
+    parser.add_argument("--metrics-interval", type=float,
+                        help="период записи файла метрик в модельных секундах (0 - только в конце прогона)")
+    parser.add_argument("--profile-events", action="store_true", default=None,
+                        help="измерять время обработчика каждого типа событий календаря")
+    parser.add_argument("--breakdown", action="store_true", default=None, dest="statistics_breakdown",
+                        help="собирать временную статистику отдельно по курсам и студентам")
+    parser.add_argument("--retain-records", type=int, dest="records_retention", metavar="N",
+                        help="сколько последних завершённых заявок хранить подробно; остальные сворачиваются в итоги")
+    parser.add_argument("--spill-records", dest="records_spill", metavar="PATH",
+                        help="дописывать вытесненные подробные записи заявок в CSV-файл")
+    parser.add_argument("--replications", type=int,
+                        help="число независимых прогонов без интерфейса с доверительными интервалами")
+    parser.add_argument("--workers", type=int, help="число процессов для прогонов (по умолчанию по числу ядер)")
+    parser.add_argument("--sweep", metavar="SPEC",
+                        help="JSON-файл с перебором параметров (сетка или латинский гиперкуб), запуск без интерфейса")
+    parser.add_argument("--checkpoint", metavar="PATH", help="сохранить состояние модели в контрольную точку")
+    parser.add_argument("--checkpoint-at", type=float, metavar="TIME",
+                        help="модельное время сохранения контрольной точки (по умолчанию - конец прогона)")
+    parser.add_argument("--resume", metavar="PATH",
+                        help="продолжить модель из контрольной точки; --applications, --buffer-size и --seed "
+                             "заменяют сохранённые значения")
+    parser.add_argument("--record-trace", metavar="PATH",
+                        help="записать приходы заявок, отчисления и удаления преподавателей в трассу")
+    parser.add_argument("--replay-trace", metavar="PATH",
+                        help="воспроизвести события из трассы вместо генераторов (--applications 0 - вся трасса)")
+    parser.add_argument("--import-trace", nargs=2, metavar=("CSV", "TRACE"),
+                        help="преобразовать журнал записи (time, student, course, event) в трассу")
+    parser.add_argument("--sweep-cache", metavar="PATH",
+                        help="файл кэша результатов перебора (по умолчанию рядом с файлом перебора)")
+    return parser.parse_args(argv)
+
+def load_config(args):
+    config = dict(DEFAULT_CONFIG)
+    if args.config:
+        with open(args.config, encoding="utf-8") as config_file:
+            config.update(json.load(config_file))
+
+    overrides = {
+        "applications": args.applications,
+        "students": args.students,
+        "buffer_size": args.buffer_size,
+        "buffer_policy": args.buffer_policy,
+        "courses": args.course,
+        "teachers": args.teacher,
+        "seed": args.seed,
+        "random_backend": args.random_backend,
+        "teacher_policy": args.teacher_policy,
+        "teacher_capacity": args.teacher_capacity,
+        "statistics_breakdown": args.statistics_breakdown,
+        "records_retention": args.records_retention,
+        "records_spill": args.records_spill,
+        "log_size": args.log_size,
+        "log_level": args.log_level,
+        "muted_sources": args.muted_sources,
+        "log_file": args.log_file,
+        "log_format": args.log_format,
+        "metrics": args.metrics,
+        "metrics_file": args.metrics_file,
+        "metrics_format": args.metrics_format,
+        "metrics_interval": args.metrics_interval,
+        "profile_events": args.profile_events,
+        "replications": args.replications,
+        "workers": args.workers,
+        "checkpoint": args.checkpoint,
+        "checkpoint_at": args.checkpoint_at,
+        "record_trace": args.record_trace,
+        "replay_trace": args.replay_trace,
+    }
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    return config
+
+def collect_summary(school, students_pool):
+    simulation = school.simulation
+    total_applications, total_refusals, refusal_rate = simulation.queue.get_refusals()
+    return {
+        "students": len(students_pool),
+        "total_applications": total_applications,
+        "buffer_size": simulation.queue.max_size,
+        "buffer_policy": simulation.queue.buffer_policy,
+        "total_refusals": total_refusals,
+        "refusal_rate": refusal_rate,
+        "model_time": simulation.clock.now(),
+        "student_summary": [
+            {
+                "name": student.name,
+                "applications_sent": student.applications_sent,
+                "refusals": student.refusals,
+                "refusal_rate": student.get_refusal_probability(),
+            }
+            for student in students_pool
+        ],
+        "teacher_summary": collect_teacher_summary(school),
+        "time_statistics": collect_time_statistics(simulation),
+        "records": simulation.queue.records.column_statistics(simulation.queue.time_statistics.track_courses),
+        "metrics": simulation.metrics.snapshot() if simulation.metrics.enabled else None,
+    }
+
+def run_headless(config, output=None, resume=None, resume_overrides=None):
+    if resume:
+        school, students_pool = resume_simulation(resume, resume_overrides or {})
+        simulation = school.simulation
+        configure_logging(simulation, config)
+    else:
+        if config["applications"] <= 0 and not config["replay_trace"]:
+            raise ValueError("Для запуска без интерфейса нужно задать число заявок (--applications)")
+        school, students_pool = build_school(config)
+        simulation = school.simulation
+        configure_logging(simulation, config)
+        trace = TraceReplayer(config["replay_trace"]) if config["replay_trace"] else None
+        if config["record_trace"]:
+            simulation.trace_recorder = TraceRecorder(config["record_trace"])
+        start_simulation(school, students_pool, ApplicationLimit(config["applications"]), trace)
+
+    writer = None
+    stopped = False
+    try:
+        if config["checkpoint"] and config["checkpoint_at"] is not None:
+            simulation.calendar.run(until=config["checkpoint_at"])
+            stopped = simulation.calendar.stopped
+            if not stopped:
+                writer = save_checkpoint(school, students_pool, config["checkpoint"])
+        # Повторный run сбросил бы флаг остановки, и самовозобновляющиеся события крутились бы вечно
+        if not stopped:
+            simulation.calendar.run()
+        # Без момента сохранения (или если модель остановилась раньше) сохраняется итоговое состояние
+        if config["checkpoint"] and writer is None:
+            writer = save_checkpoint(school, students_pool, config["checkpoint"])
+    finally:
+        simulation.logger.detach_sink()
+        if simulation.trace_recorder:
+            simulation.trace_recorder.close()
+        if writer:
+            writer.join()
+    if simulation.metrics.export_path:
+        simulation.metrics.export()
+
+    summary = collect_summary(school, students_pool)
+
+    print(format_summary_table(school, students_pool))
+    print(format_student_summary_table(students_pool))
+    print(format_teacher_summary_table(school, summary["teacher_summary"]))
+    print(format_time_statistics(simulation, summary["time_statistics"]))
+
+    if output:
+        with open(output, "w", encoding="utf-8") as output_file:
+            json.dump(summary, output_file, ensure_ascii=False, indent=2)
+
+    return summary
+
+# Критические значения t-распределения Стьюдента для 95% доверительного интервала
+T_CRITICAL_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+    11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093,
+    20: 2.086, 21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048,
+    29: 2.045, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980,
+}
+T_CRITICAL_DEGREES = sorted(T_CRITICAL_95)
+
+def t_critical_95(degrees):
+    if degrees > T_CRITICAL_DEGREES[-1]:
+        return 1.960
+    # Между табличными значениями берётся меньшее число степеней свободы (более широкий интервал)
+    return T_CRITICAL_95[T_CRITICAL_DEGREES[bisect.bisect_right(T_CRITICAL_DEGREES, degrees) - 1]]
+
+REPLICATION_METRICS = (
+    ("total_applications", "Общее количество заявок"),
+    ("total_refusals", "Число отказов"),
+    ("refusal_rate", "Вероятность отказа (%)"),
+    ("model_time", "Модельное время"),
+    ("average_waiting_time", "Среднее время ожидания (Tож)"),
+    ("average_processing_time", "Среднее время обслуживания (Tобсл)"),
+    ("average_system_time", "Среднее время в системе (Твс)"),
+    ("variance_waiting_time", "Дисперсия времени ожидания (Dож)"),
+    ("variance_processing_time", "Дисперсия времени обслуживания (Dобсл)"),
+    ("system_utilization", "Загрузка системы (%)"),
+)
+
+def replication_metrics(summary):
+    metrics = {
+        "total_applications": summary["total_applications"],
+        "total_refusals": summary["total_refusals"],
+        "refusal_rate": summary["refusal_rate"],
+        "model_time": summary["model_time"],
+        "system_utilization": summary["teacher_summary"]["system_utilization"],
+    }
+    for key, _ in REPLICATION_METRICS:
+        if key in summary["time_statistics"]:
+            metrics[key] = summary["time_statistics"][key]
+    for teacher_name, values in summary["teacher_summary"]["teachers"].items():
+        metrics[f"teacher_load:{teacher_name}"] = values["load"]
+    return metrics
+
+class ReplicationSummary:
+    # Итоги независимых прогонов сливаются по мере готовности, поэтому частичный результат доступен сразу
+    def __init__(self, planned):
+        self.planned = planned
+        self.seeds = []
+        self.metrics = {}
+
+    def add(self, seed, summary):
+        self.seeds.append(seed)
+        for name, value in replication_metrics(summary).items():
+            if name not in self.metrics:
+                self.metrics[name] = RunningStatistics(quantiles=())
+            self.metrics[name].add(value)
+
+    def confidence_interval(self, name):
+        statistics = self.metrics[name]
+        standard_deviation = math.sqrt(statistics.sample_variance())
+        if statistics.count > 1:
+            half_width = t_critical_95(statistics.count - 1) * standard_deviation / math.sqrt(statistics.count)
+        else:
+            half_width = float("inf")
+        return {
+            "mean": statistics.mean,
+            "std": standard_deviation,
+            "half_width": half_width,
+            "low": statistics.mean - half_width,
+            "high": statistics.mean + half_width,
+            "count": statistics.count,
+        }
 
-            ApplicationQueue.process_queue()
+    def metric_labels(self):
+        labels = [(name, label) for name, label in REPLICATION_METRICS if name in self.metrics]
+        labels += [
+            (name, f"Загрузка {name.partition(':')[2]} (%)")
+            for name in self.metrics if name.startswith("teacher_load:")
+        ]
+        return labels
+
+    def as_dict(self):
+        return {
+            "replications": len(self.seeds),
+            "planned": self.planned,
+            "confidence": 0.95,
+            "seeds": list(self.seeds),
+            "metrics": {name: self.confidence_interval(name) for name, _ in self.metric_labels()},
+        }
 
-        sleep(7)
+def format_replication_table(replication_summary):
+    table = f"Прогонов: {len(replication_summary.seeds)} из {replication_summary.planned}, доверительная вероятность 95%\n"
+    table += f"{'Показатель':<40} | {'Среднее':>12} | {'± полуширина':>12}\n" + "-" * 72 + "\n"
+    for name, label in replication_summary.metric_labels():
+        interval = replication_summary.confidence_interval(name)
+        table += f"{label:<40} | {interval['mean']:>12.2f} | {interval['half_width']:>12.2f}\n"
+    return table
+
+def run_replication(config, seed):
+    # Выполняется в отдельном процессе: своя модель, свой генератор, без файла журнала и без выгрузки
+    # метрик и записей заявок - иначе все процессы писали бы в одни файлы; снимок метрик возвращается в сводке
+    school, students_pool = build_school(dict(
+        config, seed=seed, metrics=config.get("metrics") or bool(config.get("metrics_file")), metrics_file=None,
+        records_spill=None,
+    ))
+    simulation = school.simulation
+    configure_logging(simulation, dict(config, log_file=None))
+    trace = TraceReplayer(config["replay_trace"]) if config.get("replay_trace") else None
+    start_simulation(school, students_pool, ApplicationLimit(config["applications"]), trace)
+    simulation.calendar.run()
+    return seed, collect_summary(school, students_pool)
+
+def run_replications(config, replications, workers=None, on_result=None):
+    if config["applications"] <= 0 and not config.get("replay_trace"):
+        raise ValueError("Для запуска без интерфейса нужно задать число заявок (--applications)")
+
+    # Зерна реплик выводятся из общего зерна конфигурации, поэтому весь набор воспроизводим
+    seed_source = random.Random(config.get("seed"))
+    seeds = [seed_source.getrandbits(32) for _ in range(replications)]
+
+    replication_summary = ReplicationSummary(replications)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_replication, config, seed) for seed in seeds]
+        for future in as_completed(futures):
+            seed, summary = future.result()
+            replication_summary.add(seed, summary)
+            if on_result:
+                on_result(replication_summary)
+    return replication_summary
+
+def report_replication_progress(replication_summary):
+    interval = replication_summary.confidence_interval("refusal_rate")
+    print(
+        f"Прогон {len(replication_summary.seeds)}/{replication_summary.planned}: "
+        f"вероятность отказа {interval['mean']:.2f}% ± {interval['half_width']:.2f}",
+        file=sys.stderr,
+    )
+
+def run_replicated(config, output=None):
+    replication_summary = run_replications(
+        config, config["replications"], config["workers"], on_result=report_replication_progress
+    )
+    print(format_replication_table(replication_summary))
+
+    if output:
+        with open(output, "w", encoding="utf-8") as output_file:
+            json.dump(replication_summary.as_dict(), output_file, ensure_ascii=False, indent=2)
+
+    return replication_summary
+
+# Параметры, не влияющие на результат прогона, в ключ кэша перебора не входят
+SWEEP_IGNORED_KEYS = frozenset((
+    "log_size", "log_level", "muted_sources", "log_file", "log_format", "log_view_lines", "monitor_interval",
+    "replications", "workers", "record_trace", "records_retention", "records_spill",
+))
+SWEEP_INTEGER_PARAMETERS = frozenset(("buffer_size", "capacity", "teachers", "arrival_min", "arrival_max"))
+
+def config_hash(config):
+    relevant = {key: value for key, value in config.items() if key not in SWEEP_IGNORED_KEYS}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def resize_teachers(config, count):
+    teachers = list(config["teachers"][:count])
+    subjects = [course["title"] for course in config["courses"]]
+    for index in range(len(teachers), count):
+        teachers.append({"name": f"Teacher_{index + 1}", "subject": subjects[index % len(subjects)]})
+    return teachers
+
+def apply_sweep_point(config, point):
+    config = dict(
+        config,
+        courses=[dict(course) for course in config["courses"]],
+        arrival_interval=list(config["arrival_interval"]),
+    )
+    applied = {}
+    for name, value in point.items():
+        base_name = name.partition(":")[0]
+        if base_name in SWEEP_INTEGER_PARAMETERS:
+            value = int(round(value))
+        applied[name] = value
+
+        if name == "buffer_size":
+            config["buffer_size"] = value
+        elif name == "buffer_policy":
+            if value not in BUFFER_POLICIES:
+                raise ValueError(f"Неизвестная дисциплина буфера '{value}'")
+            config["buffer_policy"] = value
+        elif name == "capacity":
+            for course in config["courses"]:
+                course["capacity"] = value
+        elif base_name == "capacity":
+            courses = [course for course in config["courses"] if course["title"] == name.partition(":")[2]]
+            if not courses:
+                raise ValueError(f"Курс '{name.partition(':')[2]}' не найден в конфигурации")
+            for course in courses:
+                course["capacity"] = value
+        elif name == "teachers":
+            config["teachers"] = resize_teachers(config, value)
+        elif name == "arrival_min":
+            config["arrival_interval"][0] = value
+        elif name == "arrival_max":
+            config["arrival_interval"][1] = value
+        elif name == "lambda_removal":
+            config["lambda_removal"] = float(value)
+        else:
+            raise ValueError(f"Неизвестный параметр перебора '{name}'")
+
+    # Верхняя граница интервала прихода не меньше нижней; в строке результата - фактический интервал
+    low, high = config["arrival_interval"]
+    config["arrival_interval"] = [low, max(low, high)]
+    if "arrival_min" in applied:
+        applied["arrival_min"] = low
+    if "arrival_max" in applied:
+        applied["arrival_max"] = max(low, high)
+    return config, applied
+
+def grid_points(parameters):
+    names = list(parameters)
+    return [dict(zip(names, values)) for values in itertools.product(*(parameters[name] for name in names))]
+
+def latin_hypercube_points(parameters, count, rng):
+    # Каждый диапазон делится на count равных слоёв, в каждый слой попадает ровно одна точка
+    columns = {}
+    for name, bounds in parameters.items():
+        if (not isinstance(bounds, (list, tuple)) or len(bounds) != 2
+                or not all(isinstance(bound, (int, float)) and not isinstance(bound, bool) for bound in bounds)):
+            raise ValueError(f"Для метода lhs параметр '{name}' задаётся числовым диапазоном [min, max]; "
+                             f"перечисляемые значения перебираются методом grid")
+        low, high = bounds
+        fractions = [(index + rng.random()) / count for index in range(count)]
+        rng.shuffle(fractions)
+        columns[name] = [low + fraction * (high - low) for fraction in fractions]
+    return [{name: columns[name][index] for name in parameters} for index in range(count)]
+
+def sweep_points(spec):
+    method = spec.get("method", "grid")
+    if not isinstance(spec.get("parameters"), dict) or not spec["parameters"]:
+        raise ValueError("В описании перебора нужен непустой словарь parameters")
+    if method == "grid":
+        for name, values in spec["parameters"].items():
+            if not isinstance(values, list):
+                raise ValueError(f"Для метода grid параметр '{name}' задаётся списком значений")
+        return grid_points(spec["parameters"])
+    if method == "lhs":
+        points = spec.get("points")
+        if not isinstance(points, int) or isinstance(points, bool) or points <= 0:
+            raise ValueError("Для метода lhs нужно задать число точек (points) - целое положительное число")
+        return latin_hypercube_points(spec["parameters"], points, random.Random(spec.get("seed")))
+    raise ValueError(f"Неизвестный метод перебора '{method}' (ожидается grid или lhs)")
+
+def load_sweep_cache(cache_path):
+    cache = {}
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as cache_file:
+            for line in cache_file:
+                if line.strip():
+                    record = json.loads(line)
+                    cache[record["key"]] = record["result"]
+    return cache
+
+def sweep_result(summary):
+    teachers = summary["teacher_summary"]["teachers"]
+    return {
+        "refusal_rate": summary["refusal_rate"],
+        "average_waiting_time": summary["time_statistics"]["average_waiting_time"],
+        "system_utilization": summary["teacher_summary"]["system_utilization"],
+        "teacher_load": sum(values["load"] for values in teachers.values()) / len(teachers) if teachers else 0.0,
+    }
+
+def run_sweep(config, spec, cache_path=None, workers=None, on_row=None):
+    if config["applications"] <= 0:
+        raise ValueError("Для перебора нужно задать число заявок (--applications)")
+    # Все точки используют одно зерно, поэтому различия между ними не тонут в шуме генератора
+    config = dict(config, seed=config["seed"] if config.get("seed") is not None else 0)
+
+    rows = []
+    pending = {}
+    cache = load_sweep_cache(cache_path)
+    for point in sweep_points(spec):
+        point_config, applied = apply_sweep_point(config, point)
+        key = config_hash(point_config)
+        row = dict(applied, config_hash=key, cached=key in cache)
+        rows.append(row)
+        if key in cache:
+            row.update(cache[key])
+            if on_row:
+                on_row(row)
+        else:
+            pending.setdefault(key, (point_config, []))[1].append(row)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(run_replication, point_config, point_config["seed"]): key
+                for key, (point_config, _) in pending.items()
+            }
+            cache_file = open(cache_path, "a", encoding="utf-8") if cache_path else None
+            try:
+                for future in as_completed(futures):
+                    key = futures[future]
+                    result = sweep_result(future.result()[1])
+                    if cache_file:
+                        cache_file.write(json.dumps({"key": key, "result": result}, ensure_ascii=False) + "\n")
+                        cache_file.flush()
+                    for row in pending[key][1]:
+                        row.update(result)
+                        if on_row:
+                            on_row(row)
+            finally:
+                if cache_file:
+                    cache_file.close()
+    return rows
+
+SWEEP_RESULT_COLUMNS = ("refusal_rate", "average_waiting_time", "system_utilization", "teacher_load")
+
+def sweep_columns(rows):
+    parameters = []
+    for row in rows:
+        parameters.extend(name for name in row if name not in parameters)
+    return [name for name in parameters if name not in SWEEP_RESULT_COLUMNS and name != "cached"] + list(
+        SWEEP_RESULT_COLUMNS)
+
+def format_sweep_table(rows):
+    columns = sweep_columns(rows)
+    widths = [max(len(column), 12) for column in columns]
+    table = " | ".join(f"{column:>{width}}" for column, width in zip(columns, widths)) + "\n"
+    table += "-" * (sum(widths) + 3 * (len(widths) - 1)) + "\n"
+    for row in rows:
+        cells = []
+        for column, width in zip(columns, widths):
+            value = row.get(column, "")
+            cells.append(f"{value:>{width}.2f}" if isinstance(value, float) else f"{value!s:>{width}}")
+        table += " | ".join(cells) + "\n"
+    return table
+
+def write_sweep_output(rows, output):
+    with open(output, "w", encoding="utf-8", newline="") as output_file:
+        if output.endswith(".csv"):
+            writer = csv.DictWriter(output_file, fieldnames=sweep_columns(rows), extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, output_file, ensure_ascii=False, indent=2)
 
-def main():
-    course1 = Course("Painting", capacity=2)
-    course2 = Course("Design", capacity=3)
-    course3 = Course("Graphics", capacity=3)
-    course4 = Course("Art", capacity=2)
+def run_sweep_command(config, spec_path, cache_path=None, output=None):
+    with open(spec_path, encoding="utf-8") as spec_file:
+        spec = json.load(spec_file)
+    cache_path = cache_path or os.path.splitext(spec_path)[0] + ".cache.jsonl"
 
-    teacher1 = Teacher("Alice", "Painting")
-    teacher2 = Teacher("Bob", "Design")
-    teacher3 = Teacher("Cony", "Art")
+    def report(row):
+        source = "кэш" if row["cached"] else "расчёт"
+        print(f"Точка {row['config_hash']} ({source}): отказы {row['refusal_rate']:.2f}%", file=sys.stderr)
 
-    school = School("Art School")
-    school.courses = [course1, course2, course3, course4]
-    school.add_teacher(teacher1)
-    school.add_teacher(teacher2)
-    school.add_teacher(teacher3)
+    rows = run_sweep(config, spec, cache_path, config["workers"], on_row=report)
+    print(format_sweep_table(rows))
+    if output:
+        write_sweep_output(rows, output)
+    return rows
 
-    students_pool = [Student(f"Student_{i}", i) for i in range(1, 11)]
+def run_gui(config):
+    load_gui_modules()
+    school, students_pool = build_school(config)
+    configure_logging(school.simulation, config)
 
     root = tk.Tk()
-    app = ArtSchoolApp(root, school, students_pool)
+    app = ArtSchoolApp(
+        root, school, students_pool,
+        log_view_lines=config["log_view_lines"],
+        monitor_interval=config["monitor_interval"],
+        checkpoint_path=config["checkpoint"] or "artschool.ckpt",
+    )
+    app.application_limit.set(config["applications"])
 
-    Thread(target=manage_courses_and_teachers, args=(school, app), daemon=True).start()
-    Thread(target=generate_applications, args=(school, app, students_pool), daemon=True).start()
+    Thread(target=run_simulation, args=(school, app, students_pool), daemon=True).start()
 
     root.mainloop()
+    school.simulation.logger.detach_sink()
+    if school.simulation.metrics.export_path:
+        school.simulation.commands.call(school.simulation.metrics.export)
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = load_config(args)
+
+    if args.import_trace:
+        try:
+            records = import_trace(*args.import_trace)
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return 2
+        print(f"Записей в трассе {args.import_trace[1]}: {records}")
+    elif args.sweep:
+        try:
+            run_sweep_command(config, args.sweep, args.sweep_cache, args.output)
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            return 2
+    elif args.headless:
+        try:
+            if config["replications"] > 0:
+                run_replicated(config, args.output)
+            elif args.resume:
+                resume_overrides = {"applications": args.applications, "buffer_size": args.buffer_size,
+                                    "seed": args.seed}
+                run_headless(config, args.output, args.resume, resume_overrides)
+            else:
+                run_headless(config, args.output)
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            return 2
+    else:
+        # Продолжение из контрольной точки и сохранение по модельному времени есть только без интерфейса
+        if args.resume or config["checkpoint_at"] is not None:
+            print("--resume и --checkpoint-at работают только вместе с --headless", file=sys.stderr)
+            return 2
+        if config["record_trace"] or config["replay_trace"]:
+            print("--record-trace и --replay-trace работают только вместе с --headless", file=sys.stderr)
+            return 2
+        run_gui(config)
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,285 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from artSchool import Course, School, Simulation, Student, start_simulation, submit_application
+
+# Масштабы прогонов: число заявок (операций), размеры буфера и число курсов
+SCALES = {
+    "quick": {
+        "applications": (10, 1000, 10000),
+        "buffer_sizes": (10, 1000),
+        "courses": (10, 100),
+    },
+    "full": {
+        "applications": (10, 1000, 100000, 1000000),
+        "buffer_sizes": (10, 1000, 100000),
+        "courses": (10, 1000, 10000),
+    },
+}
+
+class Measurement:
+    # Время каждой операции в наносекундах; подготовка между операциями не измеряется
+    def __init__(self):
+        self.latencies = []
+
+    def time(self, operation, *args):
+        started = time.perf_counter_ns()
+        result = operation(*args)
+        self.latencies.append(time.perf_counter_ns() - started)
+        return result
+
+def build_workload(buffer_size, courses, capacity, students=None, seed=0):
+    simulation = Simulation(seed=seed, max_queue_size=buffer_size, random_backend="python")
+    school = School("Benchmark", simulation, teacher_capacity=0)
+    for index in range(courses):
+        school.add_course(Course(f"Course_{index}", capacity))
+    # Студентов достаточно, чтобы пары (студент, курс) почти не повторялись
+    students = students or max(1000, 2 * buffer_size)
+    students_pool = [Student(f"Student_{index}", index) for index in range(1, students + 1)]
+    return school, students_pool
+
+def fill_buffer(school, students_pool, rng, count):
+    queue = school.simulation.queue
+    attempts = 0
+    while len(queue.applications) < min(count, queue.max_size) and attempts < 10 * count:
+        submit_application(rng.choice(students_pool), rng.choice(school.courses))
+        attempts += 1
+
+def bench_queue_add(measurement, applications, buffer_size, courses):
+    # Подача заявок на заполненные курсы: ApplicationQueue.add и вытеснение при переполнении
+    school, students_pool = build_workload(buffer_size, courses, capacity=0)
+    rng = random.Random(1)
+    picks = [(rng.choice(students_pool), rng.choice(school.courses)) for _ in range(applications)]
+    for student, course in picks:
+        measurement.time(submit_application, student, course)
+    return {"refusals": school.simulation.queue.total_refusals}
+
+def bench_remove_random_student(measurement, applications, buffer_size, courses):
+    # Отчисление студента освобождает место, которое сразу занимает заявка из буфера этого курса
+    school, students_pool = build_workload(buffer_size, courses, capacity=1)
+    rng = random.Random(2)
+    fill_buffer(school, students_pool, rng, courses + buffer_size)
+    for _ in range(applications):
+        course = rng.choice(school.courses)
+        measurement.time(course.remove_random_student)
+        submit_application(rng.choice(students_pool), course)
+
+def bench_process_queue(measurement, applications, buffer_size, courses):
+    # Обход курсов с ожидающими заявками после появления свободного места на одном из них
+    school, students_pool = build_workload(buffer_size, courses, capacity=0)
+    queue = school.simulation.queue
+    rng = random.Random(3)
+    fill_buffer(school, students_pool, rng, buffer_size)
+    for _ in range(applications):
+        rng.choice(school.courses).capacity += 1
+        measurement.time(queue.process_queue)
+        fill_buffer(school, students_pool, rng, buffer_size)
+
+def bench_log_add_entry(measurement, applications, buffer_size, courses):
+    school, _ = build_workload(buffer_size, courses, capacity=0)
+    logger = school.simulation.logger
+    for index in range(applications):
+        measurement.time(logger.add_entry, "Benchmark", "Событие", "Заявка {} на курс {}", (index, "Course_0"))
+
+def bench_simulation(measurement, applications, buffer_size, courses):
+    # Полный прогон модели без интерфейса; пропускная способность - события календаря в секунду
+    school, students_pool = build_workload(buffer_size, courses, capacity=2, students=max(10, courses))
+    start_simulation(school, students_pool, lambda: applications)
+    events = measurement.time(school.simulation.calendar.run)
+    return {"events": events}
+
+def bench_calculate_statistics(measurement, applications, buffer_size, courses):
+    school, students_pool = build_workload(buffer_size, courses, capacity=2, students=max(10, courses))
+    start_simulation(school, students_pool, lambda: applications)
+    school.simulation.calendar.run()
+    for _ in range(1000):
+        measurement.time(school.simulation.queue.calculate_statistics)
+
+BENCHMARKS = {
+    "queue_add": bench_queue_add,
+    "remove_random_student": bench_remove_random_student,
+    "process_queue": bench_process_queue,
+    "log_add_entry": bench_log_add_entry,
+    "simulation": bench_simulation,
+    "calculate_statistics": bench_calculate_statistics,
+}
+
+# Параметры, от которых зависит каждый тест; по остальным осям он не размножается
+BENCHMARK_AXES = {
+    "queue_add": ("applications", "buffer_size", "courses"),
+    "remove_random_student": ("applications", "buffer_size", "courses"),
+    "process_queue": ("applications", "buffer_size", "courses"),
+    "log_add_entry": ("applications",),
+    "simulation": ("applications", "buffer_size", "courses"),
+    "calculate_statistics": ("applications",),
+}
+
+# Базовая линия масштаба quick хранится рядом со скриптом и используется по умолчанию: запуск
+# python benchmark.py завершается с кодом 1, если пропускная способность упала больше допуска.
+# Пропускная способность зависит от машины, поэтому файл в репозитории - эталон машины разработчика;
+# после намеренного изменения производительности он перезаписывается:
+#     python benchmark.py --no-baseline --output benchmark_baseline.json
+# В CI линия снимается на том же исполнителе с базового коммита, затем проверяется изменение:
+#     git checkout <база> && python benchmark.py --no-baseline --output /tmp/base.json
+#     git checkout <изменение> && python benchmark.py --baseline /tmp/base.json
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+DEFAULT_PARAMETERS = {"applications": 1000, "buffer_size": 10, "courses": 10}
+AXIS_SCALES = {"applications": "applications", "buffer_size": "buffer_sizes", "courses": "courses"}
+
+def percentile(sorted_values, quantile):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(quantile * len(sorted_values)))]
+
+def run_case(name, parameters, measure_memory=True, repeat=1):
+    # Из нескольких повторов берётся самый быстрый: остальные искажены посторонней нагрузкой
+    best = None
+    for _ in range(repeat):
+        measurement = Measurement()
+        extra = BENCHMARKS[name](measurement, **parameters) or {}
+        if best is None or sum(measurement.latencies) < sum(best[0].latencies):
+            best = measurement, extra
+    measurement, extra = best
+    latencies = sorted(measurement.latencies)
+    total_seconds = sum(latencies) / 1e9
+    operations = extra.get("events", len(latencies))
+
+    result = {
+        "benchmark": name,
+        "parameters": parameters,
+        "operations": operations,
+        "total_seconds": total_seconds,
+        "throughput": operations / total_seconds if total_seconds > 0 else 0.0,
+        "latency_ns": {
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0,
+        },
+        "extra": extra,
+    }
+
+    if measure_memory:
+        # Отдельный прогон под tracemalloc, чтобы трассировка не искажала время
+        tracemalloc.start()
+        BENCHMARKS[name](Measurement(), **parameters)
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def plan_cases(names, scale):
+    for name in names:
+        axes = BENCHMARK_AXES[name]
+        for combination in itertools.product(*(scale[AXIS_SCALES[axis]] for axis in axes)):
+            parameters = dict(DEFAULT_PARAMETERS, **dict(zip(axes, combination)))
+            # Буфер больше числа заявок не заполнится - такие точки ничего не добавляют
+            if parameters["buffer_size"] > max(parameters["applications"], DEFAULT_PARAMETERS["buffer_size"]):
+                continue
+            yield name, parameters
+
+def case_key(result):
+    return result["benchmark"], tuple(sorted(result["parameters"].items()))
+
+# Случаи короче этого времени измеряются с шумом порядка самих значений и замедлением не считаются
+MIN_COMPARED_SECONDS = 0.05
+
+def compare_with_baseline(results, baseline, tolerance):
+    baseline_cases = {case_key(case): case for case in baseline["cases"]}
+    regressions = []
+    for result in results:
+        reference = baseline_cases.get(case_key(result))
+        if reference is None or reference["throughput"] <= 0:
+            continue
+        ratio = result["throughput"] / reference["throughput"]
+        result["baseline_ratio"] = ratio
+        if ratio < 1 - tolerance and reference["total_seconds"] >= MIN_COMPARED_SECONDS:
+            regressions.append(result)
+    return regressions
+
+def format_results(results):
+    table = (f"{'Тест':<22} | {'Параметры':<44} | {'Операций/с':>12} | {'p50, мкс':>9} | {'p99, мкс':>9} | "
+             f"{'Память, КБ':>10} | {'К базе':>6}\n")
+    table += "-" * 130 + "\n"
+    for result in results:
+        parameters = " ".join(f"{key}={value}" for key, value in result["parameters"].items())
+        memory = result.get("peak_memory_bytes")
+        ratio = result.get("baseline_ratio")
+        table += (
+            f"{result['benchmark']:<22} | {parameters:<44} | {result['throughput']:>12.0f} | "
+            f"{result['latency_ns']['p50'] / 1000:>9.1f} | {result['latency_ns']['p99'] / 1000:>9.1f} | "
+            f"{f'{memory / 1024:.0f}' if memory is not None else '-':>10} | "
+            f"{f'{ratio:.2f}' if ratio is not None else '-':>6}\n"
+        )
+    return table
+
+def parse_list(value):
+    return tuple(int(float(item)) for item in value.split(","))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочные тесты очереди заявок художественной школы")
+    parser.add_argument("--scale", choices=list(SCALES), default="quick", help="набор масштабов")
+    parser.add_argument("--benchmark", action="append", choices=list(BENCHMARKS), dest="benchmarks",
+                        help="запустить только этот тест (можно указать несколько раз)")
+    parser.add_argument("--applications", type=parse_list, help="число заявок через запятую, например 10,1e4")
+    parser.add_argument("--buffer-sizes", type=parse_list, help="размеры буфера через запятую")
+    parser.add_argument("--courses", type=parse_list, help="число курсов через запятую")
+    parser.add_argument("--no-memory", action="store_true", help="не измерять пиковую память")
+    parser.add_argument("--repeat", type=int, default=3, help="число повторов каждого случая, берётся лучший")
+    parser.add_argument("--output", help="записать результаты в JSON (годится как базовая линия)")
+    parser.add_argument("--baseline",
+                        help="JSON с базовой линией для сравнения (для quick по умолчанию benchmark_baseline.json)")
+    parser.add_argument("--no-baseline", action="store_true", help="не сравнивать с базовой линией")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="допустимое падение пропускной способности относительно базовой линии")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    scale = dict(SCALES[args.scale])
+    for key in ("applications", "buffer_sizes", "courses"):
+        if getattr(args, key):
+            scale[key] = getattr(args, key)
+
+    results = []
+    for name, parameters in plan_cases(args.benchmarks or list(BENCHMARKS), scale):
+        result = run_case(name, parameters, measure_memory=not args.no_memory, repeat=args.repeat)
+        results.append(result)
+        print(f"{name} {parameters}: {result['throughput']:.0f} оп/с", file=sys.stderr)
+
+    baseline = args.baseline
+    if baseline is None and args.scale == "quick" and os.path.exists(BASELINE_PATH):
+        baseline = BASELINE_PATH
+
+    regressions = []
+    if baseline and not args.no_baseline:
+        with open(baseline, encoding="utf-8") as baseline_file:
+            regressions = compare_with_baseline(results, json.load(baseline_file), args.tolerance)
+
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "scale": args.scale,
+                "cases": results,
+            }, output_file, ensure_ascii=False, indent=2)
+
+    if regressions:
+        for result in regressions:
+            print(f"Замедление: {result['benchmark']} {result['parameters']} - "
+                  f"{result['baseline_ratio']:.2f} от базовой линии", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())